@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+下载卡片渲染使用的固定版本字体到 assets/fonts/
+
+字体来自 notofonts/noto-cjk 的固定 release tag（不跟随 main 分支），
+下载后校验 SHA-256：assets/fonts/fonts.lock.json 中已有哈希时必须一致；
+首次下载时把哈希写入 lock 文件，提交 lock 文件后其他机器拿到的就是同一份字体
+
+使用方法:
+    python fetch_fonts.py            # 下载缺少的字体并校验
+    python fetch_fonts.py --verify   # 只校验已有字体，不下载
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import urllib.request
+from pathlib import Path
+
+FONTS_DIR = Path(__file__).parent.parent / "assets" / "fonts"
+LOCK_FILE = FONTS_DIR / "fonts.lock.json"
+
+FONT_RELEASE = "Sans2.004"
+FONT_BASE_URL = f"https://github.com/notofonts/noto-cjk/raw/{FONT_RELEASE}/Sans/SubsetOTF/SC"
+FONT_FILES = ["NotoSansSC-Regular.otf", "NotoSansSC-Bold.otf"]
+
+
+def sha256_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_lock() -> dict:
+    if not LOCK_FILE.exists():
+        return {}
+    with open(LOCK_FILE, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_lock(lock: dict):
+    FONTS_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_path = str(LOCK_FILE) + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(lock, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write('\n')
+    os.replace(tmp_path, LOCK_FILE)
+
+
+def download(name: str) -> Path:
+    """下载到临时文件（同目录，校验通过后再原子替换）"""
+    url = f"{FONT_BASE_URL}/{name}"
+    print(f"  ⬇️ {url}")
+    fd, tmp_path = tempfile.mkstemp(dir=FONTS_DIR, prefix=f".{name}.")
+    try:
+        with os.fdopen(fd, 'wb') as f, urllib.request.urlopen(url, timeout=120) as response:
+            for chunk in iter(lambda: response.read(1 << 20), b''):
+                f.write(chunk)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    return Path(tmp_path)
+
+
+def fetch_fonts(verify_only: bool = False) -> bool:
+    FONTS_DIR.mkdir(parents=True, exist_ok=True)
+    lock = load_lock()
+    lock_changed = False
+    ok = True
+    for name in FONT_FILES:
+        path = FONTS_DIR / name
+        expected = lock.get(name, {}).get('sha256')
+
+        if path.exists():
+            actual = sha256_file(path)
+            if expected and actual != expected:
+                print(f"❌ {name} 的 SHA-256 与 lock 不一致（{actual[:12]} != {expected[:12]}），请删除后重新下载")
+                ok = False
+            else:
+                print(f"✅ {name} 已存在")
+            continue
+
+        if verify_only:
+            print(f"❌ 缺少 {name}，请运行: python {Path(__file__).name}")
+            ok = False
+            continue
+
+        try:
+            tmp_path = download(name)
+        except Exception as e:
+            print(f"❌ 下载 {name} 失败: {e}")
+            ok = False
+            continue
+        actual = sha256_file(tmp_path)
+        if expected and actual != expected:
+            tmp_path.unlink()
+            print(f"❌ {name} 下载内容与 lock 中的 SHA-256 不一致，已丢弃")
+            ok = False
+            continue
+        os.replace(tmp_path, path)
+        if not expected:
+            lock[name] = {'sha256': actual, 'release': FONT_RELEASE}
+            lock_changed = True
+            print(f"  📌 已记录 {name} 的 SHA-256，请提交 {LOCK_FILE.name}")
+        print(f"✅ {name}（{path.stat().st_size / 1024 / 1024:.1f} MB）")
+
+    if lock_changed:
+        save_lock(lock)
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description='下载并校验卡片渲染使用的固定版本字体')
+    parser.add_argument('--verify', action='store_true', help='只校验已有字体，不下载')
+    args = parser.parse_args()
+    sys.exit(0 if fetch_fonts(verify_only=args.verify) else 1)
+
+
+if __name__ == '__main__':
+    main()
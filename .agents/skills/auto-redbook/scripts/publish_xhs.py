@@ -6,27 +6,60 @@
 使用方法:
     python publish_xhs.py --title "标题" --desc "描述" --images cover.png card_1.png card_2.png
 
+    # 离线演练：完整走一遍校验 / 压缩 / 上传流程，不需要 Cookie，也不会真正发布
+    python publish_xhs.py --title "标题" --images output/*.png --dry-run
+
 环境变量:
     在同目录下创建 .env 文件，配置 XHS_COOKIE：
     XHS_COOKIE=your_cookie_string_here
 
 依赖安装:
     pip install xhs python-dotenv
+    pip install pillow  # 可选：上传前校验并压缩大图
 """
 
 import argparse
+import concurrent.futures
+import json
 import os
+import random
+import shutil
 import sys
+import tempfile
+import time
+import uuid
 from pathlib import Path
 
 try:
     from dotenv import load_dotenv
-    from xhs import XhsClient
 except ImportError as e:
     print(f"缺少依赖: {e}")
     print("请运行: pip install xhs python-dotenv")
     sys.exit(1)
 
+# --dry-run 使用离线客户端，不需要安装 xhs
+try:
+    from xhs import XhsClient
+except ImportError:
+    XhsClient = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+# 小红书支持的图片格式
+IMAGE_MIME_TYPES = {'.jpg': 'image/jpeg', '.jpeg': 'image/jpeg', '.png': 'image/png', '.webp': 'image/webp'}
+
+# 同时处理（校验 / 压缩 / 上传）的图片数
+DEFAULT_WORKERS = 4
+# 单张图片上传失败后的重试次数（指数退避）
+DEFAULT_RETRIES = 3
+RETRY_BACKOFF = 1.0
+# 超过该大小的图片上传前转为 JPEG 压缩
+DEFAULT_MAX_KB = 1024
+
 
 def load_cookie():
     """从 .env 文件加载 Cookie"""
@@ -52,6 +85,10 @@ def load_cookie():
 
 def create_client(cookie: str) -> XhsClient:
     """创建小红书客户端"""
+    if XhsClient is None:
+        print("❌ 缺少依赖: xhs")
+        print("请运行: pip install xhs python-dotenv")
+        sys.exit(1)
     try:
         # 使用本地签名
         from xhs.help import sign as local_sign
@@ -66,14 +103,61 @@ def create_client(cookie: str) -> XhsClient:
         sys.exit(1)
 
 
-def validate_images(image_paths: list) -> list:
-    """验证图片文件是否存在"""
+class DryRunClient:
+    """
+    离线客户端：与 XhsClient 的发布接口一致，上传只按文件大小模拟耗时，
+    不访问网络。fail_rate > 0 时随机让上传失败，用于演练重试逻辑。
+    """
+
+    def __init__(self, upload_kbps: float = 2048, fail_rate: float = 0.0):
+        self.upload_kbps = upload_kbps
+        self.fail_rate = fail_rate
+
+    def get_self_info(self) -> dict:
+        return {'nickname': '离线演练'}
+
+    def get_upload_files_permit(self, file_type: str, count: int = 1) -> tuple:
+        return uuid.uuid4().hex, 'dry-run-token'
+
+    def upload_file(self, file_id: str, token: str, file_path: str, content_type: str = "image/jpeg"):
+        time.sleep(os.path.getsize(file_path) / 1024 / self.upload_kbps)
+        if random.random() < self.fail_rate:
+            raise ConnectionError("模拟上传失败")
+
+    def create_note(self, title, desc, note_type, ats: list = None, topics: list = None,
+                    image_info: dict = None, video_info: dict = None,
+                    post_time: str = None, is_private: bool = False) -> dict:
+        return {'note_id': f"dry-run-{uuid.uuid4().hex[:12]}", 'images': len((image_info or {}).get('images', []))}
+
+
+def validate_image(path: str) -> str:
+    """校验单张图片，返回错误原因；通过时返回 None"""
+    if not os.path.isfile(path):
+        return "图片不存在"
+    if Path(path).suffix.lower() not in IMAGE_MIME_TYPES:
+        return f"不支持的格式（支持: {', '.join(IMAGE_MIME_TYPES)}）"
+    if os.path.getsize(path) == 0:
+        return "文件为空"
+    if Image is not None:
+        try:
+            with Image.open(path) as image:
+                image.verify()
+        except Exception as e:
+            return f"图片已损坏: {e}"
+    return None
+
+
+def validate_images(image_paths: list, workers: int = DEFAULT_WORKERS) -> list:
+    """并发验证图片文件（保持原顺序）"""
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        errors = list(pool.map(validate_image, image_paths))
+
     valid_images = []
-    for path in image_paths:
-        if os.path.exists(path):
-            valid_images.append(os.path.abspath(path))
+    for path, error in zip(image_paths, errors):
+        if error:
+            print(f"⚠️ 警告: {error} - {path}")
         else:
-            print(f"⚠️ 警告: 图片不存在 - {path}")
+            valid_images.append(os.path.abspath(path))
     
     if not valid_images:
         print("❌ 错误: 没有有效的图片文件")
@@ -82,23 +166,101 @@ def validate_images(image_paths: list) -> list:
     return valid_images
 
 
+def precompress_image(path: str, work_dir: str, index: int, max_kb: int = DEFAULT_MAX_KB) -> str:
+    """超过 max_kb 的图片转为 JPEG 并逐步降低质量压缩，返回实际上传的文件路径"""
+    if Image is None or not max_kb or os.path.getsize(path) <= max_kb * 1024:
+        return path
+
+    output_path = os.path.join(work_dir, f"{index:02d}_{Path(path).stem}.jpg")
+    with Image.open(path) as image:
+        image = image.convert('RGB')
+        for quality in (90, 85, 80, 70, 60):
+            image.save(output_path, 'JPEG', quality=quality, optimize=True, progressive=True)
+            if os.path.getsize(output_path) <= max_kb * 1024:
+                break
+
+    if os.path.getsize(output_path) >= os.path.getsize(path):
+        return path
+    print(f"  🗜️ 已压缩: {Path(path).name} {os.path.getsize(path) // 1024} KB"
+          f" → {os.path.getsize(output_path) // 1024} KB")
+    return output_path
+
+
+def upload_image(client: XhsClient, path: str, retries: int = DEFAULT_RETRIES) -> dict:
+    """上传单张图片（失败时指数退避重试），返回 create_note 所需的图片信息"""
+    content_type = IMAGE_MIME_TYPES[Path(path).suffix.lower()]
+    for attempt in range(retries + 1):
+        try:
+            # 每次重试重新申请上传凭证，避免使用过期 token
+            file_id, token = client.get_upload_files_permit("image")
+            client.upload_file(file_id, token, path, content_type=content_type)
+            break
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = RETRY_BACKOFF * 2 ** attempt
+            print(f"  ⚠️ 上传失败，{delay:.0f}s 后重试 ({attempt + 1}/{retries}) - {Path(path).name}: {e}")
+            time.sleep(delay)
+
+    return {
+        "file_id": file_id,
+        "metadata": {"source": -1},
+        "stickers": {"version": 2, "floating": []},
+        "extra_info_json": json.dumps({"mimeType": content_type}, separators=(",", ":")),
+    }
+
+
+def upload_images(client: XhsClient, images: list, workers: int = DEFAULT_WORKERS,
+                  retries: int = DEFAULT_RETRIES, max_kb: int = DEFAULT_MAX_KB) -> list:
+    """
+    每张图片独立走 压缩 → 上传 流水线，最多 workers 张同时进行，
+    总耗时约等于最慢的一张。返回的图片信息与输入顺序一致。
+    """
+    work_dir = tempfile.mkdtemp(prefix="xhs_upload_")
+
+    def process(index: int, path: str) -> dict:
+        start = time.monotonic()
+        upload_path = precompress_image(path, work_dir, index, max_kb)
+        info = upload_image(client, upload_path, retries)
+        print(f"  ⬆️ 已上传 ({index + 1}/{len(images)}): {Path(path).name}"
+              f"（{os.path.getsize(upload_path) // 1024} KB, {time.monotonic() - start:.1f}s）")
+        return info
+
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(process, i, path) for i, path in enumerate(images)]
+            return [future.result() for future in futures]
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
 def publish_note(client: XhsClient, title: str, desc: str, images: list, 
-                 is_private: bool = False, post_time: str = None):
-    """发布图文笔记"""
+                 is_private: bool = False, post_time: str = None,
+                 workers: int = DEFAULT_WORKERS, retries: int = DEFAULT_RETRIES,
+                 max_kb: int = DEFAULT_MAX_KB):
+    """发布图文笔记：并发上传所有图片后创建笔记"""
     try:
         print(f"\n🚀 准备发布笔记...")
         print(f"  📌 标题: {title}")
         print(f"  📝 描述: {desc[:50]}..." if len(desc) > 50 else f"  📝 描述: {desc}")
-        print(f"  🖼️ 图片数量: {len(images)}")
+        print(f"  🖼️ 图片数量: {len(images)}（并发: {workers}）")
         
-        result = client.create_image_note(
-            title=title,
-            desc=desc,
-            files=images,
+        start = time.monotonic()
+        image_info = upload_images(client, images, workers, retries, max_kb)
+        print(f"  ⏱️ 图片上传用时 {time.monotonic() - start:.1f}s")
+
+        result = client.create_note(
+            title, desc, "normal",
+            ats=[], topics=[],
+            image_info={"images": image_info},
             is_private=is_private,
             post_time=post_time
         )
         
+        if isinstance(client, DryRunClient):
+            print("\n✅ 验证通过，可以发布（离线演练，未实际发布）")
+            return result
+
         print("\n✨ 笔记发布成功！")
         if isinstance(result, dict):
             note_id = result.get('note_id') or result.get('id')
@@ -157,7 +319,25 @@ def main():
     parser.add_argument(
         '--dry-run',
         action='store_true',
-        help='仅验证，不实际发布'
+        help='仅验证，不实际发布（使用离线客户端演练完整流程，不需要 Cookie）'
+    )
+    parser.add_argument(
+        '--workers', '-w',
+        type=int,
+        default=DEFAULT_WORKERS,
+        help=f'同时校验 / 压缩 / 上传的图片数（默认: {DEFAULT_WORKERS}）'
+    )
+    parser.add_argument(
+        '--retries',
+        type=int,
+        default=DEFAULT_RETRIES,
+        help=f'单张图片上传失败的重试次数（默认: {DEFAULT_RETRIES}）'
+    )
+    parser.add_argument(
+        '--max-kb',
+        type=int,
+        default=DEFAULT_MAX_KB,
+        help=f'超过该大小（KB）的图片上传前压缩为 JPEG，0 表示不压缩（默认: {DEFAULT_MAX_KB}，需要 Pillow）'
     )
     
     args = parser.parse_args()
@@ -167,25 +347,18 @@ def main():
         print(f"⚠️ 警告: 标题超过20字，将被截断")
         args.title = args.title[:20]
     
-    # 加载 Cookie
-    cookie = load_cookie()
-    
     # 验证图片
-    valid_images = validate_images(args.images)
-    
-    # 创建客户端
-    client = create_client(cookie)
-    
-    # 获取用户信息（验证 Cookie 有效性）
-    get_user_info(client)
+    valid_images = validate_images(args.images, args.workers)
     
     if args.dry_run:
-        print("\n🔍 验证模式 - 不会实际发布")
-        print(f"  📌 标题: {args.title}")
-        print(f"  📝 描述: {args.desc}")
-        print(f"  🖼️ 图片: {valid_images}")
-        print("\n✅ 验证通过，可以发布")
-        return
+        print("\n🔍 验证模式 - 使用离线客户端，不会实际发布")
+        client = DryRunClient()
+    else:
+        # 加载 Cookie 并创建客户端
+        client = create_client(load_cookie())
+        
+        # 获取用户信息（验证 Cookie 有效性）
+        get_user_info(client)
     
     # 发布笔记
     publish_note(
@@ -194,7 +367,10 @@ def main():
         desc=args.desc,
         images=valid_images,
         is_private=args.private,
-        post_time=args.post_time
+        post_time=args.post_time,
+        workers=args.workers,
+        retries=args.retries,
+        max_kb=args.max_kb
     )
 
 
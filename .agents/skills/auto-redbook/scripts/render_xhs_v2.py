@@ -14,14 +14,24 @@
 依赖安装:
     pip install markdown pyyaml playwright
     playwright install chromium
+    pip install pillow  # 可选：PNG 压缩及 WebP/JPEG 输出
 """
 
 import argparse
 import asyncio
+import functools
+import hashlib
+import io
+import json
+import multiprocessing
 import os
+import shutil
+import time
 import re
 import sys
 import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
 from pathlib import Path
 from typing import List, Dict, Tuple
 
@@ -34,6 +44,11 @@ except ImportError as e:
     print("请运行: pip install markdown pyyaml playwright && playwright install chromium")
     sys.exit(1)
 
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
 
 # 获取脚本所在目录
 SCRIPT_DIR = Path(__file__).parent.parent
@@ -50,6 +65,30 @@ CARD_HEIGHT = 1440
 # 安全边距: ~40px
 SAFE_HEIGHT = CARD_HEIGHT - 120 - 100 - 80 - 40  # ~1100px
 
+# 页面池大小（同时渲染的页面数）
+DEFAULT_POOL_SIZE = 4
+
+# 输出格式：png 为无损压缩，webp / jpeg 按质量有损压缩（体积通常只有 PNG 的几分之一）
+OUTPUT_FORMATS = {'png': '.png', 'webp': '.webp', 'jpeg': '.jpg'}
+DEFAULT_QUALITY = 85
+# 指定 --max-kb 时逐步降低质量，最低不低于该值
+MIN_QUALITY = 50
+
+# 卡片 / 封面 HTML 模板有改动时递增，使旧的渲染缓存失效
+TEMPLATE_VERSION = 2
+# 渲染缓存目录（位于输出目录下）
+CACHE_DIRNAME = ".render_cache"
+
+# 本地字体：运行 fetch_fonts.py 把固定版本的 Noto Sans SC 下载到 assets/fonts/，渲染完全离线、结果可复现
+# 文件名中的字重关键字（如 NotoSansSC-Bold.otf）决定 font-weight
+# 没有本地字体时默认直接报错；--allow-network-fonts（或 XHS_ALLOW_NETWORK_FONTS=1）才允许从 Google Fonts 在线加载
+FONTS_DIR = ASSETS_DIR / "fonts"
+ALLOW_NETWORK_FONTS = os.getenv("XHS_ALLOW_NETWORK_FONTS") == "1"
+LOCAL_ASSET_ORIGIN = "https://xhs.local"
+FONT_MIME_TYPES = {'.woff2': 'font/woff2', '.woff': 'font/woff', '.ttf': 'font/ttf', '.otf': 'font/otf'}
+FONT_WEIGHTS = [('thin', 100), ('extralight', 200), ('light', 300), ('regular', 400), ('medium', 500),
+                ('semibold', 600), ('bold', 700), ('extrabold', 800), ('black', 900), ('heavy', 900)]
+
 # 样式配置
 STYLES = {
     "purple": {
@@ -98,6 +137,32 @@ STYLES = {
 }
 
 
+# 高度预估校准数据（按样式保存拟合系数和样本），启动时载入到 STYLES[key]['height_model']
+CALIBRATION_FILE = ASSETS_DIR / "height_calibration.json"
+HEIGHT_FEATURES = ['blank', 'h1', 'h2', 'h3', 'code', 'li', 'quote', 'img', 'para', 'cjk', 'latin']
+MIN_CALIBRATION_SAMPLES = 20
+MAX_CALIBRATION_SAMPLES = 2000
+
+
+def load_calibration() -> dict:
+    """读取校准文件，并把各样式的拟合系数挂到 STYLES 上"""
+    if not CALIBRATION_FILE.exists():
+        return {}
+    try:
+        with open(CALIBRATION_FILE, 'r', encoding='utf-8') as f:
+            calibration = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ 读取高度校准数据失败: {e}")
+        return {}
+    for style_key, entry in calibration.items():
+        if style_key in STYLES and entry.get('coefficients'):
+            STYLES[style_key]['height_model'] = entry['coefficients']
+    return calibration
+
+
+load_calibration()
+
+
 def parse_markdown_file(file_path: str) -> dict:
     """解析 Markdown 文件，提取 YAML 头部和正文内容"""
     with open(file_path, 'r', encoding='utf-8') as f:
@@ -129,8 +194,48 @@ def split_content_by_separator(body: str) -> list:
     return [part.strip() for part in parts if part.strip()]
 
 
-def estimate_content_height(content: str) -> int:
-    """预估内容高度（基于字数和元素类型）"""
+def content_features(content: str) -> Dict[str, int]:
+    """提取高度预估特征：各类元素的行数，以及中文 / 西文字符数（二者宽度不同）"""
+    features = dict.fromkeys(HEIGHT_FEATURES, 0)
+    for line in content.split('\n'):
+        line = line.strip()
+        if not line:
+            features['blank'] += 1
+            continue
+
+        text = line
+        if line.startswith('# '):
+            features['h1'] += 1
+        elif line.startswith('## '):
+            features['h2'] += 1
+        elif line.startswith('### '):
+            features['h3'] += 1
+        elif line.startswith('```'):
+            features['code'] += 1
+            continue
+        elif line.startswith(('- ', '* ', '+ ')):
+            features['li'] += 1
+        elif line.startswith('>'):
+            features['quote'] += 1
+        elif line.startswith('!['):
+            features['img'] += 1
+            continue
+        else:
+            features['para'] += 1
+
+        cjk = len(re.findall(r'[\u4e00-\u9fa5\u3000-\u303f\uff00-\uffef]', text))
+        features['cjk'] += cjk
+        features['latin'] += len(text) - cjk
+    return features
+
+
+def estimate_content_height(content: str, style_key: str = None) -> int:
+    """预估内容高度（有校准系数时使用拟合模型，否则基于字数和元素类型）"""
+    model = STYLES.get(style_key, {}).get('height_model') if style_key else None
+    if model:
+        features = content_features(content)
+        return int(sum(model.get(name, 0) * value for name, value in features.items()))
+
     lines = content.split('\n')
     total_height = 0
     
@@ -170,7 +275,71 @@ def estimate_content_height(content: str) -> int:
     return total_height
 
 
-def smart_split_content(content: str, max_height: int = SAFE_HEIGHT) -> List[str]:
+def solve_least_squares(samples: List[Tuple[Dict[str, int], float]], names: List[str]) -> List[float]:
+    """最小二乘拟合 height ≈ Σ 系数 × 特征（只用 names 中的特征，带少量岭回归正则，纯 Python 求解）"""
+    n = len(names)
+    ata = [[0.0] * n for _ in range(n)]
+    atb = [0.0] * n
+    for features, height in samples:
+        x = [features.get(name, 0) for name in names]
+        for i in range(n):
+            atb[i] += x[i] * height
+            for j in range(n):
+                ata[i][j] += x[i] * x[j]
+    for i in range(n):
+        ata[i][i] += 1e-3 * (ata[i][i] + 1)
+
+    # 高斯消元（部分主元）
+    m = [row[:] + [atb[i]] for i, row in enumerate(ata)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(m[r][col]))
+        m[col], m[pivot] = m[pivot], m[col]
+        for r in range(n):
+            if r != col and m[col][col]:
+                factor = m[r][col] / m[col][col]
+                m[r] = [a - factor * b for a, b in zip(m[r], m[col])]
+    return [m[i][n] / m[i][i] if m[i][i] else 0.0 for i in range(n)]
+
+
+def fit_height_model(samples: List[Tuple[Dict[str, int], float]]) -> Dict[str, float]:
+    """
+    非负最小二乘拟合高度预估系数：
+    有系数为负时去掉最负的那个特征（系数记为 0）再用剩余特征重新拟合，
+    而不是直接把负值截成 0（那样其余系数仍是按负值拟合出来的，整体会偏）
+    """
+    names = list(HEIGHT_FEATURES)
+    while names:
+        coefficients = solve_least_squares(samples, names)
+        worst = min(range(len(names)), key=lambda i: coefficients[i])
+        if coefficients[worst] >= 0:
+            break
+        names.pop(worst)
+    else:
+        coefficients = []
+    fitted = dict(zip(names, coefficients))
+    return {name: round(fitted.get(name, 0.0), 3) for name in HEIGHT_FEATURES}
+
+
+def record_calibration(style_key: str, samples: List[Tuple[Dict[str, int], float]]):
+    """追加实测样本，重新拟合该样式的系数并持久化"""
+    calibration = load_calibration()
+    entry = calibration.setdefault(style_key, {'samples': []})
+    entry['samples'] = (entry['samples'] + [[f, h] for f, h in samples])[-MAX_CALIBRATION_SAMPLES:]
+
+    if len(entry['samples']) >= MIN_CALIBRATION_SAMPLES:
+        entry['coefficients'] = fit_height_model(entry['samples'])
+        STYLES[style_key]['height_model'] = entry['coefficients']
+        print(f"  📐 已更新 {style_key} 的高度预估系数（{len(entry['samples'])} 个样本）")
+    else:
+        print(f"  📐 已记录校准样本 {len(entry['samples'])}/{MIN_CALIBRATION_SAMPLES}")
+
+    tmp_path = str(CALIBRATION_FILE) + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(calibration, f, ensure_ascii=False)
+    os.replace(tmp_path, CALIBRATION_FILE)
+
+
+def smart_split_content(content: str, max_height: int = SAFE_HEIGHT, style_key: str = None) -> List[str]:
     """
     智能拆分内容到多张卡片
     基于预估高度进行拆分，尽量保持段落完整
@@ -211,7 +380,7 @@ def smart_split_content(content: str, max_height: int = SAFE_HEIGHT) -> List[str
     current_height = 0
     
     for block in blocks:
-        block_height = estimate_content_height(block)
+        block_height = estimate_content_height(block, style_key)
         
         # 如果单个块就超过限制，需要进一步拆分
         if block_height > max_height:
@@ -227,7 +396,7 @@ def smart_split_content(content: str, max_height: int = SAFE_HEIGHT) -> List[str
             sub_height = 0
             
             for line in lines:
-                line_height = estimate_content_height(line)
+                line_height = estimate_content_height(line, style_key)
                 
                 if sub_height + line_height > max_height and sub_block:
                     cards.append('\n'.join(sub_block))
@@ -364,10 +533,11 @@ def generate_cover_html(metadata: dict, style_key: str = "purple") -> str:
 
 
 def generate_card_html(content: str, page_number: int = 1, total_pages: int = 1, 
-                       style_key: str = "purple") -> str:
-    """生成正文卡片 HTML"""
+                       style_key: str = "purple", html_content: str = None) -> str:
+    """生成正文卡片 HTML（传入 html_content 时直接使用，不再转换 content）"""
     style = STYLES.get(style_key, STYLES["purple"])
-    html_content = convert_markdown_to_html(content, style)
+    if html_content is None:
+        html_content = convert_markdown_to_html(content, style)
     page_text = f"{page_number}/{total_pages}" if total_pages > 1 else ""
     
     # 暗黑模式特殊处理
@@ -515,109 +685,541 @@ def generate_card_html(content: str, page_number: int = 1, total_pages: int = 1,
 </html>'''
 
 
+# 就绪信号：字体加载完成后再等两帧，确保布局和绘制都已完成
+READY_JS = '''async () => {
+    await document.fonts.ready;
+    await new Promise(resolve => requestAnimationFrame(() => requestAnimationFrame(resolve)));
+    return true;
+}'''
+
+
+@functools.lru_cache(maxsize=1)
+def font_signature() -> str:
+    """本地字体文件名与大小（参与渲染缓存键：换字体后字形宽度不同，旧缓存失效）"""
+    if not FONTS_DIR.exists():
+        return ""
+    return ",".join(f"{p.name}:{p.stat().st_size}" for p in sorted(FONTS_DIR.iterdir())
+                    if p.suffix.lower() in FONT_MIME_TYPES)
+
+
+def build_font_css() -> str:
+    """为 assets/fonts/ 下的字体文件生成 @font-face（没有本地字体时为空）"""
+    if not FONTS_DIR.exists():
+        return ""
+    rules = []
+    for path in sorted(FONTS_DIR.iterdir()):
+        if path.suffix.lower() not in FONT_MIME_TYPES:
+            continue
+        stem = path.stem.lower().replace('-', '').replace('_', '')
+        weight = next((w for name, w in sorted(FONT_WEIGHTS, key=lambda x: -len(x[0])) if name in stem), None)
+        # 没有字重关键字的视为可变字体
+        weight_range = str(weight) if weight else "100 900"
+        rules.append(
+            "@font-face { font-family: 'Noto Sans SC'; font-style: normal; "
+            f"font-weight: {weight_range}; font-display: block; "
+            f"src: url('{LOCAL_ASSET_ORIGIN}/fonts/{path.name}'); }}"
+        )
+    return "\n".join(rules)
+
+
+async def install_asset_routes(page: Page, font_css: str):
+    """
+    拦截外部字体请求：Google Fonts 的 CSS 换成本地 @font-face，
+    字体文件直接从 assets/fonts/ 读取，渲染不再依赖网络。
+    font_css 为空（仅在显式允许在线字体时）才放行 Google Fonts 请求
+    """
+    async def serve_font_css(route):
+        if not font_css:
+            await route.continue_()
+            return
+        await route.fulfill(status=200, content_type='text/css', body=font_css)
+
+    async def serve_local_asset(route):
+        name = route.request.url.rsplit('/', 1)[-1]
+        path = FONTS_DIR / name
+        if path.parent == FONTS_DIR and path.exists():
+            await route.fulfill(status=200, body=path.read_bytes(),
+                                content_type=FONT_MIME_TYPES.get(path.suffix.lower(), 'application/octet-stream'),
+                                headers={'Access-Control-Allow-Origin': '*'})
+        else:
+            await route.abort()
+
+    async def block(route):
+        if not font_css:
+            await route.continue_()
+            return
+        await route.abort()
+
+    await page.route("**/fonts.googleapis.com/**", serve_font_css)
+    await page.route("**/fonts.gstatic.com/**", block)
+    await page.route(f"{LOCAL_ASSET_ORIGIN}/**", serve_local_asset)
+
+
+async def load_html(page: Page, html_content: str):
+    """加载 HTML 并等待就绪信号（替代 networkidle + 固定等待）"""
+    await page.set_content(html_content, wait_until='load')
+    await page.evaluate(READY_JS)
+
+
+# 一次 evaluate 同时返回卡片总高度和每个顶层块的底部偏移（相对 .card-inner 顶部），按行拆分时据此选分页点
+MEASURE_LAYOUT_JS = '''() => {
+    const inner = document.querySelector('.card-inner');
+    const root = inner || document.querySelector('.card-container') || document.body;
+    const top = root.getBoundingClientRect().top;
+    const content = document.querySelector('.card-content');
+    const blocks = content ? Array.from(content.children).map(
+        el => Math.ceil(el.getBoundingClientRect().bottom - top)
+    ) : [];
+    return {height: root.scrollHeight, blocks: blocks};
+}'''
+
+
+# 测量模式：每个 Markdown 块包一层 flow-root 容器，使块的外边距计入其包围盒
+MEASURE_BLOCKS_JS = '''() => {
+    const content = document.querySelector('.card-content');
+    const top = content.getBoundingClientRect().top;
+    return Array.from(document.querySelectorAll('.md-block')).map(el => {
+        const box = el.getBoundingClientRect();
+        return {top: box.top - top, bottom: box.bottom - top};
+    });
+}'''
+
+# 卡片内容区可用高度：.card-inner 上限 (CARD_HEIGHT - 100) 减去其上下 padding 60px * 2
+CONTENT_HEIGHT_LIMIT = CARD_HEIGHT - 100 - 120
+
+
+async def measure_layout(page: Page, html_content: str) -> Dict:
+    """加载一次页面，返回 {'height': 总高度, 'blocks': [各块底部偏移]}"""
+    await load_html(page, html_content)
+    return await page.evaluate(MEASURE_LAYOUT_JS)
+
+
 async def measure_content_height(page: Page, html_content: str) -> int:
     """使用 Playwright 测量实际内容高度"""
-    await page.set_content(html_content, wait_until='networkidle')
-    await page.wait_for_timeout(300)  # 等待字体渲染
-    
-    height = await page.evaluate('''() => {
-        const inner = document.querySelector('.card-inner');
-        if (inner) {
-            return inner.scrollHeight;
-        }
-        const container = document.querySelector('.card-container');
-        return container ? container.scrollHeight : document.body.scrollHeight;
-    }''')
-    
-    return height
+    layout = await measure_layout(page, html_content)
+    return layout['height']
 
 
-async def render_html_to_image(html_content: str, output_path: str, 
-                                width: int = CARD_WIDTH, height: int = CARD_HEIGHT):
-    """使用 Playwright 将 HTML 渲染为图片"""
-    async with async_playwright() as p:
-        browser = await p.chromium.launch()
-        page = await browser.new_page(viewport={'width': width, 'height': height})
-        
+def encode_image(data: bytes, output_path: str, image_format: str = "png",
+                 quality: int = DEFAULT_QUALITY, max_kb: int = None) -> int:
+    """
+    在编码进程池中运行：把内存中的 PNG 截图编码为目标格式并原子写入，返回文件字节数
+    - png：无损优化
+    - webp / jpeg：按 quality 压缩；给定 max_kb 时逐步降低质量直到不超过该大小
+    """
+    if Image is None:
+        if image_format != 'png':
+            raise RuntimeError("输出 webp / jpeg 需要 Pillow: pip install pillow")
+        encoded = data
+    else:
+        image = Image.open(io.BytesIO(data))
+        if image_format == 'png':
+            buffer = io.BytesIO()
+            image.save(buffer, 'PNG', optimize=True)
+            encoded = min(buffer.getvalue(), data, key=len)
+        else:
+            image = image.convert('RGB')
+            while True:
+                buffer = io.BytesIO()
+                if image_format == 'webp':
+                    image.save(buffer, 'WEBP', quality=quality, method=4)
+                else:
+                    image.save(buffer, 'JPEG', quality=quality, optimize=True, progressive=True)
+                encoded = buffer.getvalue()
+                if not max_kb or len(encoded) <= max_kb * 1024 or quality <= MIN_QUALITY:
+                    break
+                quality = max(MIN_QUALITY, quality - 10)
+
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(encoded)
+    os.replace(tmp_path, output_path)
+    return len(encoded)
+
+
+class CardRenderer:
+    """
+    渲染服务：整个进程只启动一次 Chromium，并维护一个页面池。
+    封面、卡片截图和高度测量都从池中借用页面，可以并发执行。
+    截图只保存在内存中，交给编码进程池压缩为目标格式后写盘，页面立即归还。
+
+    用法:
+        async with CardRenderer(pool_size=4) as renderer:
+            await renderer.render(html, 'card_1.png')
+    """
+
+    def __init__(self, pool_size: int = DEFAULT_POOL_SIZE,
+                 width: int = CARD_WIDTH, height: int = CARD_HEIGHT,
+                 image_format: str = "png", quality: int = DEFAULT_QUALITY,
+                 max_kb: int = None, encode_workers: int = None):
+        if image_format not in OUTPUT_FORMATS:
+            raise ValueError(f"未知输出格式: {image_format}（可选: {', '.join(OUTPUT_FORMATS)}）")
+        self.pool_size = max(1, pool_size)
+        self.width = width
+        self.height = height
+        self.image_format = image_format
+        self.quality = quality
+        self.max_kb = max_kb
+        self.encode_workers = encode_workers
+        self._playwright = None
+        self.browser = None
+        self._pages = None
+        self._encoder = None
+
+    @property
+    def extension(self) -> str:
+        return OUTPUT_FORMATS[self.image_format]
+
+    @property
+    def output_options(self) -> Dict:
+        """影响输出文件内容的编码参数（参与缓存键）"""
+        return {'format': self.image_format, 'quality': self.quality, 'max_kb': self.max_kb}
+
+    async def start(self):
+        if Image is None and self.image_format != 'png':
+            raise RuntimeError("输出 webp / jpeg 需要 Pillow: pip install pillow")
+        # 先检查字体再启动浏览器：缺字体时直接失败，而不是悄悄用在线 / 系统字体渲染出不一致的卡片
+        font_css = build_font_css()
+        if not font_css:
+            if not ALLOW_NETWORK_FONTS:
+                raise RuntimeError(
+                    f"{FONTS_DIR} 中没有字体文件：请先运行 python scripts/fetch_fonts.py 下载固定版本的字体，"
+                    "或加 --allow-network-fonts 从 Google Fonts 在线加载（渲染结果依赖网络和系统字体）"
+                )
+            print("  ⚠️ assets/fonts/ 中没有字体文件，按 --allow-network-fonts 从 Google Fonts 在线加载字体")
+        if Image is not None:
+            # spawn：不 fork 已经持有 Playwright 连接和事件循环的进程
+            self._encoder = ProcessPoolExecutor(max_workers=self.encode_workers,
+                                                mp_context=multiprocessing.get_context('spawn'))
+        self._playwright = await async_playwright().start()
+        self.browser = await self._playwright.chromium.launch()
+        self._pages = asyncio.Queue()
+        pages = await asyncio.gather(*[
+            self.browser.new_page(viewport={'width': self.width, 'height': self.height})
+            for _ in range(self.pool_size)
+        ])
+        for page in pages:
+            await install_asset_routes(page, font_css)
+            self._pages.put_nowait(page)
+        return self
+
+    async def close(self):
+        if self.browser:
+            await self.browser.close()
+            self.browser = None
+        if self._playwright:
+            await self._playwright.stop()
+            self._playwright = None
+        if self._encoder:
+            self._encoder.shutdown()
+            self._encoder = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    @asynccontextmanager
+    async def page(self):
+        """从页面池借用一个页面，用完归还"""
+        page = await self._pages.get()
         try:
-            await page.set_content(html_content, wait_until='networkidle')
-            await page.wait_for_timeout(300)
+            yield page
+        finally:
+            self._pages.put_nowait(page)
+
+    async def measure(self, html_content: str) -> int:
+        async with self.page() as page:
+            return await measure_content_height(page, html_content)
+
+    async def measure_layout(self, html_content: str) -> Dict:
+        async with self.page() as page:
+            return await measure_layout(page, html_content)
+
+    async def render(self, html_content: str, output_path: str,
+                     width: int = CARD_WIDTH, height: int = CARD_HEIGHT):
+        async with self.page() as page:
+            await load_html(page, html_content)
             
-            # 截图固定尺寸
-            await page.screenshot(
-                path=output_path,
+            # 截图固定尺寸（只保留在内存中）
+            data = await page.screenshot(
                 clip={'x': 0, 'y': 0, 'width': width, 'height': height},
                 type='png'
             )
-            
-            print(f"  ✅ 已生成: {output_path}")
-            
-        finally:
-            await browser.close()
 
+        # 页面已归还，编码在进程池中进行，不阻塞后续截图
+        size = await asyncio.get_running_loop().run_in_executor(
+            self._encoder, encode_image, data, output_path,
+            self.image_format, self.quality, self.max_kb
+        )
+        print(f"  ✅ 已生成: {output_path}（{size / 1024:.0f} KB）")
 
-async def process_and_render_cards(card_contents: List[str], output_dir: str, 
-                                   style_key: str) -> List[str]:
+
+async def render_html_to_image(html_content: str, output_path: str, 
+                                width: int = CARD_WIDTH, height: int = CARD_HEIGHT,
+                                renderer: CardRenderer = None):
+    """使用 Playwright 将 HTML 渲染为图片（未传入 renderer 时临时启动一个）"""
+    if renderer:
+        await renderer.render(html_content, output_path, width, height)
+        return
+    async with CardRenderer(pool_size=1, width=width, height=height) as own_renderer:
+        await own_renderer.render(html_content, output_path, width, height)
+
+
+def estimate_lines_per_card(lines: List[str], style_key: str, max_height: int = CONTENT_HEIGHT_LIMIT) -> int:
+    """用预估模型（未校准时为经验常数）猜测一张卡片能放下的行数，至少 1 行"""
+    used = 0
+    for count, line in enumerate(lines):
+        used += estimate_content_height(line, style_key)
+        if used > max_height:
+            return max(1, count)
+    return len(lines)
+
+
+async def split_lines_to_cards(renderer: CardRenderer, lines: List[str], style_key: str) -> List[str]:
     """
-    处理卡片内容，检测高度并自动分页，然后渲染
-    返回最终生成的所有卡片文件路径
+    按行拆分溢出内容：每行包成一个块，一次布局测量取回各块底部偏移，直接选出能放下的行数，
+    再实测校验一次（校验不通过时才二分）
+    渲染的行数以预估模型猜测值的两倍为窗口，窗口内全部放得下时才扩大窗口
     """
-    async with async_playwright() as p:
-        browser = await p.chromium.launch()
-        page = await browser.new_page(viewport={'width': CARD_WIDTH, 'height': CARD_HEIGHT})
-        
-        all_cards = []
-        
-        try:
-            for content in card_contents:
-                # 预估内容高度
-                estimated_height = estimate_content_height(content)
-                
-                # 如果预估高度超过安全高度，尝试拆分
-                if estimated_height > SAFE_HEIGHT:
-                    split_contents = smart_split_content(content, SAFE_HEIGHT)
+    limit = CARD_HEIGHT - 100
+    style = STYLES.get(style_key, STYLES["purple"])
+
+    async def fits(count: int) -> bool:
+        html = generate_card_html('\n'.join(lines[start:start + count]), 1, 1, style_key)
+        return await renderer.measure(html) <= limit
+
+    async def lines_within(count: int) -> int:
+        body = '<style>.md-block { display: flow-root; }</style>'
+        for line in lines[start:start + count]:
+            body += f'<div class="md-block">{convert_markdown_to_html(line, style)}</div>'
+        layout = await renderer.measure_layout(generate_card_html("", 1, 1, style_key, html_content=body))
+        blocks = layout['blocks']
+        # 最后一块下方的 padding 等固定高度
+        tail = layout['height'] - blocks[-1] if blocks else 0
+        fitted = 0
+        while fitted < len(blocks) and blocks[fitted] + tail <= limit:
+            fitted += 1
+        return fitted
+
+    cards = []
+    start = 0
+    while start < len(lines):
+        remaining = len(lines) - start
+        window = min(remaining, 2 * estimate_lines_per_card(lines[start:], style_key))
+        count = await lines_within(window)
+        while count == window < remaining:
+            window = min(remaining, window * 2)
+            count = await lines_within(window)
+
+        # 单行放不下时也至少放 1 行；逐行成块与整段渲染略有差异，校验失败时在 [1, count) 内二分
+        count = max(1, count)
+        if count > 1 and not await fits(count):
+            lo, hi = 1, count
+            while hi - lo > 1:
+                mid = (lo + hi) // 2
+                if await fits(mid):
+                    lo = mid
                 else:
-                    split_contents = [content]
-                
-                # 验证每个拆分后的内容
-                for split_content in split_contents:
-                    # 生成临时 HTML 测量
-                    temp_html = generate_card_html(split_content, 1, 1, style_key)
-                    actual_height = await measure_content_height(page, temp_html)
-                    
-                    # 如果仍然超出，进一步按行拆分
-                    if actual_height > CARD_HEIGHT - 100:
-                        lines = split_content.split('\n')
-                        sub_contents = []
-                        sub_lines = []
-                        sub_height = 0
-                        
-                        for line in lines:
-                            test_lines = sub_lines + [line]
-                            test_html = generate_card_html('\n'.join(test_lines), 1, 1, style_key)
-                            test_height = await measure_content_height(page, test_html)
-                            
-                            if test_height > CARD_HEIGHT - 100 and sub_lines:
-                                sub_contents.append('\n'.join(sub_lines))
-                                sub_lines = [line]
-                            else:
-                                sub_lines = test_lines
-                        
-                        if sub_lines:
-                            sub_contents.append('\n'.join(sub_lines))
-                        
-                        all_cards.extend(sub_contents)
-                    else:
-                        all_cards.append(split_content)
+                    hi = mid
+            count = lo
+
+        cards.append('\n'.join(lines[start:start + count]))
+        start += count
+
+    return cards
+
+
+def split_markdown_blocks(content: str) -> List[str]:
+    """按空行将 Markdown 拆分为块，代码块内部的空行不拆分"""
+    blocks = []
+    current = []
+    in_code = False
+    for line in content.split('\n'):
+        if line.strip().startswith('```'):
+            in_code = not in_code
+        if not line.strip() and not in_code:
+            if current:
+                blocks.append('\n'.join(current))
+                current = []
+            continue
+        current.append(line)
+    if current:
+        blocks.append('\n'.join(current))
+    return blocks
+
+
+def paginate_blocks(heights: List[float], limit: float = CONTENT_HEIGHT_LIMIT) -> List[List[int]]:
+    """根据每块的实测高度在 Python 中计算分页，返回每张卡片包含的块下标"""
+    pages = []
+    current = []
+    used = 0
+    for i, height in enumerate(heights):
+        if current and used + height > limit:
+            pages.append(current)
+            current = []
+            used = 0
+        current.append(i)
+        used += height
+    if current:
+        pages.append(current)
+    return pages
+
+
+async def measure_blocks(renderer: CardRenderer, chunks: List[List[str]], style_key: str) -> List[List[float]]:
+    """
+    一次布局测量：所有块放进同一个卡片宽度的容器，加载一次页面，
+    通过一次 evaluate 取回全部块的高度
+    """
+    style = STYLES.get(style_key, STYLES["purple"])
+    body = '<style>.md-block { display: flow-root; }</style>'
+    for blocks in chunks:
+        for block in blocks:
+            body += f'<div class="md-block">{convert_markdown_to_html(block, style)}</div>'
+    html = generate_card_html("", 1, 1, style_key, html_content=body)
+
+    async with renderer.page() as page:
+        await load_html(page, html)
+        boxes = await page.evaluate(MEASURE_BLOCKS_JS)
+
+    heights = [box['bottom'] - box['top'] for box in boxes]
+    result = []
+    for blocks in chunks:
+        result.append(heights[:len(blocks)])
+        heights = heights[len(blocks):]
+    return result
+
+
+async def paginate_by_layout(renderer: CardRenderer, card_contents: List[str], style_key: str,
+                             calibrate: bool = False) -> List[str]:
+    """
+    布局测量分页：整篇内容只做一次布局，分页点在 Python 中计算
+    calibrate=True 时把 (块特征, 实测高度) 记录为预估模型的校准样本
+    """
+    chunks = [split_markdown_blocks(content) for content in card_contents]
+    heights = await measure_blocks(renderer, chunks, style_key)
+
+    if calibrate:
+        record_calibration(style_key, [
+            (content_features(block), height)
+            for blocks, block_heights in zip(chunks, heights)
+            for block, height in zip(blocks, block_heights)
+        ])
+
+    cards = []
+    oversized = []
+    for blocks, block_heights in zip(chunks, heights):
+        for indices in paginate_blocks(block_heights):
+            cards.append('\n\n'.join(blocks[i] for i in indices))
+            # 单个块本身就超过一张卡片时，退回到按行二分拆分
+            if len(indices) == 1 and block_heights[indices[0]] > CONTENT_HEIGHT_LIMIT:
+                oversized.append(len(cards) - 1)
+
+    if oversized:
+        splits = await asyncio.gather(*[
+            split_lines_to_cards(renderer, cards[i].split('\n'), style_key) for i in oversized
+        ])
+        for i, parts in sorted(zip(oversized, splits), reverse=True):
+            cards[i:i + 1] = parts
+
+    return cards
+
+
+async def paginate_content(renderer: CardRenderer, content: str, style_key: str) -> List[str]:
+    """对单个内容块：预估高度拆分，再用实测高度校验，返回拆分后的卡片内容"""
+    # 预估内容高度
+    estimated_height = estimate_content_height(content, style_key)
+    
+    # 如果预估高度超过安全高度，尝试拆分
+    if estimated_height > SAFE_HEIGHT:
+        split_contents = smart_split_content(content, SAFE_HEIGHT, style_key)
+    else:
+        split_contents = [content]
+    
+    cards = []
+    # 验证每个拆分后的内容
+    for split_content in split_contents:
+        # 生成临时 HTML 测量
+        temp_html = generate_card_html(split_content, 1, 1, style_key)
+        actual_height = await renderer.measure(temp_html)
         
-        finally:
-            await browser.close()
+        # 如果仍然超出，进一步按行拆分
+        if actual_height > CARD_HEIGHT - 100:
+            cards.extend(await split_lines_to_cards(renderer, split_content.split('\n'), style_key))
+        else:
+            cards.append(split_content)
     
-    return all_cards
+    return cards
+
 
+async def process_and_render_cards(card_contents: List[str], output_dir: str, 
+                                   style_key: str, renderer: CardRenderer = None,
+                                   mode: str = "layout", calibrate: bool = False) -> List[str]:
+    """
+    处理卡片内容，检测高度并自动分页
+    mode="layout": 整篇一次布局测量，在 Python 中计算分页点
+    mode="estimate": 按预估高度拆分，各内容块在页面池上并发逐张测量校验
+    calibrate=True 时总是做一次布局测量，并用结果校准预估模型
+    返回最终的卡片内容列表（按原顺序）
+    """
+    if renderer is None:
+        async with CardRenderer() as own_renderer:
+            return await process_and_render_cards(card_contents, output_dir, style_key, own_renderer,
+                                                  mode, calibrate)
+
+    if mode == "layout" or calibrate:
+        return await paginate_by_layout(renderer, card_contents, style_key, calibrate)
+
+    results = await asyncio.gather(*[
+        paginate_content(renderer, content, style_key) for content in card_contents
+    ])
+    return [card for cards in results for card in cards]
+
+
+def render_cache_key(kind: str, content, style_key: str, page_number: int = 0, total_pages: int = 0,
+                     output: Dict = None) -> str:
+    """缓存键：hash(内容, 样式定义, 页码, 总页数, 模板版本, 输出格式与质量, 本地字体)"""
+    style = {k: v for k, v in STYLES.get(style_key, {}).items() if k != 'height_model'}
+    raw = json.dumps([kind, content, style_key, style, page_number, total_pages, TEMPLATE_VERSION, output,
+                      font_signature()],
+                     ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+async def render_cached(renderer: CardRenderer, html_content: str, output_path: str,
+                        cache_key: str, cache_dir: str = None) -> bool:
+    """命中缓存时直接复制图片，否则截图并写入缓存；返回是否命中"""
+    if not cache_dir:
+        await renderer.render(html_content, output_path)
+        return False
+
+    cached_path = os.path.join(cache_dir, cache_key + os.path.splitext(output_path)[1])
+    if os.path.exists(cached_path):
+        shutil.copyfile(cached_path, output_path)
+        print(f"  ♻️ 缓存命中: {output_path}")
+        return True
+
+    await renderer.render(html_content, output_path)
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{cached_path}.{os.getpid()}.tmp"
+    shutil.copyfile(output_path, tmp_path)
+    os.replace(tmp_path, cached_path)
+    return False
+
+
+async def render_markdown_to_cards(md_file: str, output_dir: str, style_key: str = "purple",
+                                   renderer: CardRenderer = None, paginate: str = "layout",
+                                   calibrate: bool = False, use_cache: bool = True):
+    """
+    主渲染函数：将 Markdown 文件渲染为多张卡片图片
+    use_cache=True 时只重新截图内容、样式或页码有变化的卡片
+    """
+    if renderer is None:
+        async with CardRenderer() as own_renderer:
+            return await render_markdown_to_cards(md_file, output_dir, style_key, own_renderer,
+                                                  paginate, calibrate, use_cache)
 
-async def render_markdown_to_cards(md_file: str, output_dir: str, style_key: str = "purple"):
-    """主渲染函数：将 Markdown 文件渲染为多张卡片图片"""
     print(f"\n🎨 开始渲染: {md_file}")
     print(f"🎨 使用样式: {STYLES[style_key]['name']}")
     
@@ -635,45 +1237,135 @@ async def render_markdown_to_cards(md_file: str, output_dir: str, style_key: str
     
     # 处理内容，智能分页
     print("  🔍 分析内容高度并智能分页...")
-    processed_cards = await process_and_render_cards(card_contents, output_dir, style_key)
+    processed_cards = await process_and_render_cards(card_contents, output_dir, style_key, renderer,
+                                                     paginate, calibrate)
     total_cards = len(processed_cards)
     print(f"  📄 将生成 {total_cards} 张卡片")
     
-    # 生成封面
+    # 封面和正文卡片在页面池上并发截图（未变化的卡片直接取缓存）
+    cache_dir = os.path.join(output_dir, CACHE_DIRNAME) if use_cache else None
+    ext = renderer.extension
+    output = renderer.output_options
+    tasks = []
     if metadata.get('emoji') or metadata.get('title'):
         print("  📷 生成封面...")
         cover_html = generate_cover_html(metadata, style_key)
-        cover_path = os.path.join(output_dir, 'cover.png')
-        await render_html_to_image(cover_html, cover_path)
+        cover_meta = {k: metadata.get(k) for k in ('emoji', 'title', 'subtitle')}
+        tasks.append(render_cached(renderer, cover_html, os.path.join(output_dir, f'cover{ext}'),
+                                   render_cache_key('cover', cover_meta, style_key, output=output), cache_dir))
     
-    # 生成正文卡片
-    async with async_playwright() as p:
-        browser = await p.chromium.launch()
-        page = await browser.new_page(viewport={'width': CARD_WIDTH, 'height': CARD_HEIGHT})
-        
-        try:
-            for i, content in enumerate(processed_cards, 1):
-                print(f"  📷 生成卡片 {i}/{total_cards}...")
-                card_html = generate_card_html(content, i, total_cards, style_key)
-                card_path = os.path.join(output_dir, f'card_{i}.png')
-                
-                await page.set_content(card_html, wait_until='networkidle')
-                await page.wait_for_timeout(300)
-                
-                await page.screenshot(
-                    path=card_path,
-                    clip={'x': 0, 'y': 0, 'width': CARD_WIDTH, 'height': CARD_HEIGHT},
-                    type='png'
-                )
-                print(f"  ✅ 已生成: {card_path}")
-        
-        finally:
-            await browser.close()
+    for i, content in enumerate(processed_cards, 1):
+        card_html = generate_card_html(content, i, total_cards, style_key)
+        tasks.append(render_cached(renderer, card_html, os.path.join(output_dir, f'card_{i}{ext}'),
+                                   render_cache_key('card', content, style_key, i, total_cards, output),
+                                   cache_dir))
+    
+    print(f"  📷 并发生成 {total_cards} 张卡片（页面池: {renderer.pool_size}）...")
+    hits = await asyncio.gather(*tasks)
+
+    # 清理上次渲染遗留的图片：内容变短后多出的卡片，以及其他输出格式的旧文件
+    for name in os.listdir(output_dir):
+        match = re.fullmatch(r'(?:cover|card_(\d+))(\.png|\.webp|\.jpg)', name)
+        if match and (match.group(2) != ext or int(match.group(1) or 0) > total_cards):
+            os.remove(os.path.join(output_dir, name))
     
-    print(f"\n✨ 渲染完成！共生成 {total_cards} 张卡片，保存到: {output_dir}")
+    print(f"\n✨ 渲染完成！共生成 {total_cards} 张卡片（{sum(hits)} 张来自缓存），保存到: {output_dir}")
     return total_cards
 
 
+async def run_single(md_file: str, output_dir: str, style_key: str, pool_size: int,
+                     paginate: str = "layout", calibrate: bool = False, use_cache: bool = True,
+                     image_format: str = "png", quality: int = DEFAULT_QUALITY, max_kb: int = None):
+    async with CardRenderer(pool_size=pool_size, image_format=image_format,
+                            quality=quality, max_kb=max_kb) as renderer:
+        return await render_markdown_to_cards(md_file, output_dir, style_key, renderer,
+                                              paginate, calibrate, use_cache)
+
+
+def load_batch_posts(source: str, output_root: str, default_style: str) -> List[Dict]:
+    """
+    批量任务列表：
+    - 目录：目录下所有 .md 文件，输出到 <output_root>/<文件名>/
+    - 清单 JSON：[{"file": "a.md", "style": "mint", "output_dir": "out/a"}, ...]
+      （或 {"posts": [...]}），相对路径相对于清单所在目录
+    """
+    if os.path.isdir(source):
+        files = sorted(Path(source).glob('*.md'))
+        return [{'file': str(f), 'style': default_style,
+                 'output_dir': os.path.join(output_root, f.stem)} for f in files]
+
+    with open(source, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    entries = manifest.get('posts', []) if isinstance(manifest, dict) else manifest
+    base = Path(source).parent
+    posts = []
+    for entry in entries:
+        if isinstance(entry, str):
+            entry = {'file': entry}
+        md_path = base / entry['file']
+        posts.append({
+            'file': str(md_path),
+            'style': entry.get('style', default_style),
+            'output_dir': str(base / entry['output_dir']) if entry.get('output_dir')
+                          else os.path.join(output_root, md_path.stem),
+        })
+    return posts
+
+
+async def render_batch(source: str, output_root: str, style_key: str = "purple",
+                       pool_size: int = DEFAULT_POOL_SIZE, paginate: str = "layout",
+                       use_cache: bool = True, image_format: str = "png",
+                       quality: int = DEFAULT_QUALITY, max_kb: int = None) -> Dict:
+    """
+    批量渲染：所有笔记共享一个浏览器和页面池，卡片在池上统一调度，
+    吞吐量随页面池大小提升。结果（含耗时）写入 <output_root>/render_manifest.json
+    """
+    posts = load_batch_posts(source, output_root, style_key)
+    print(f"📚 批量渲染 {len(posts)} 篇笔记（页面池: {pool_size}）")
+    os.makedirs(output_root, exist_ok=True)
+
+    async def render_post(renderer: CardRenderer, post: Dict) -> Dict:
+        start = time.monotonic()
+        result = dict(post, status='ok', cards=0)
+        try:
+            if post['style'] not in STYLES:
+                raise ValueError(f"未知样式: {post['style']}")
+            result['cards'] = await render_markdown_to_cards(
+                post['file'], post['output_dir'], post['style'], renderer, paginate, use_cache=use_cache
+            )
+        except Exception as e:
+            print(f"  ❌ 渲染失败 {post['file']}: {e}")
+            result['status'] = 'error'
+            result['error'] = str(e)
+        result['seconds'] = round(time.monotonic() - start, 3)
+        return result
+
+    start = time.monotonic()
+    async with CardRenderer(pool_size=pool_size, image_format=image_format,
+                            quality=quality, max_kb=max_kb) as renderer:
+        results = await asyncio.gather(*[render_post(renderer, post) for post in posts])
+    elapsed = time.monotonic() - start
+
+    summary = {
+        'generated_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'pool_size': pool_size,
+        'format': image_format,
+        'posts': len(results),
+        'failed': sum(1 for r in results if r['status'] != 'ok'),
+        'cards': sum(r['cards'] for r in results),
+        'seconds': round(elapsed, 3),
+        'results': results,
+    }
+    manifest_path = os.path.join(output_root, 'render_manifest.json')
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    print(f"\n📦 批量渲染完成：{summary['posts']} 篇 / {summary['cards']} 张卡片，"
+          f"失败 {summary['failed']} 篇，用时 {elapsed:.1f}s")
+    print(f"📝 结果清单: {manifest_path}")
+    return summary
+
+
 def list_styles():
     """列出所有可用样式"""
     print("\n📋 可用样式列表：")
@@ -691,6 +1383,7 @@ def main():
 示例:
   python render_xhs_v2.py note.md
   python render_xhs_v2.py note.md -o ./output --style xiaohongshu
+  python render_xhs_v2.py --batch ./posts -o ./output --pool-size 8
   python render_xhs_v2.py --list-styles
         '''
     )
@@ -710,6 +1403,55 @@ def main():
         choices=list(STYLES.keys()),
         help='样式主题（默认: purple）'
     )
+    parser.add_argument(
+        '--pool-size', '-p',
+        type=int,
+        default=DEFAULT_POOL_SIZE,
+        help=f'并发渲染的页面数（默认: {DEFAULT_POOL_SIZE}）'
+    )
+    parser.add_argument(
+        '--paginate',
+        default='layout',
+        choices=['layout', 'estimate'],
+        help='分页方式：layout 一次布局测量（默认），estimate 预估高度后逐张测量'
+    )
+    parser.add_argument(
+        '--calibrate',
+        action='store_true',
+        help='用本次实测的块高度校准该样式的高度预估模型'
+    )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help=f'不使用渲染缓存（缓存位于输出目录下的 {CACHE_DIRNAME}/）'
+    )
+    parser.add_argument(
+        '--format', '-f',
+        choices=list(OUTPUT_FORMATS),
+        default='png',
+        help='输出图片格式（默认: png 无损压缩；webp / jpeg 体积更小，需要 Pillow）'
+    )
+    parser.add_argument(
+        '--quality', '-q',
+        type=int,
+        default=DEFAULT_QUALITY,
+        help=f'webp / jpeg 压缩质量 1-100（默认: {DEFAULT_QUALITY}）'
+    )
+    parser.add_argument(
+        '--max-kb',
+        type=int,
+        help=f'webp / jpeg 单张图片目标大小（KB），超出时逐步降低质量（不低于 {MIN_QUALITY}）'
+    )
+    parser.add_argument(
+        '--batch', '-b',
+        metavar='DIR_OR_MANIFEST',
+        help='批量模式：渲染目录下所有 .md，或 JSON 清单中的笔记（输出到 --output-dir 下）'
+    )
+    parser.add_argument(
+        '--allow-network-fonts',
+        action='store_true',
+        help='assets/fonts/ 中没有字体时从 Google Fonts 在线加载（默认直接报错，见 fetch_fonts.py）'
+    )
     parser.add_argument(
         '--list-styles',
         action='store_true',
@@ -717,10 +1459,23 @@ def main():
     )
     
     args = parser.parse_args()
+
+    if args.allow_network_fonts:
+        global ALLOW_NETWORK_FONTS
+        ALLOW_NETWORK_FONTS = True
     
     if args.list_styles:
         list_styles()
         return
+
+    if args.batch:
+        if not os.path.exists(args.batch):
+            print(f"❌ 错误: 路径不存在 - {args.batch}")
+            sys.exit(1)
+        summary = asyncio.run(render_batch(args.batch, args.output_dir, args.style, args.pool_size,
+                                           args.paginate, not args.no_cache,
+                                           args.format, args.quality, args.max_kb))
+        sys.exit(1 if summary['failed'] else 0)
     
     if not args.markdown_file:
         parser.print_help()
@@ -730,7 +1485,9 @@ def main():
         print(f"❌ 错误: 文件不存在 - {args.markdown_file}")
         sys.exit(1)
     
-    asyncio.run(render_markdown_to_cards(args.markdown_file, args.output_dir, args.style))
+    asyncio.run(run_single(args.markdown_file, args.output_dir, args.style, args.pool_size,
+                           args.paginate, args.calibrate, not args.no_cache,
+                           args.format, args.quality, args.max_kb))
 
 
 if __name__ == '__main__':
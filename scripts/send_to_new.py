@@ -5,6 +5,7 @@ import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from src.email_sender import EmailSender
+from src.report_index import ReportIndex
 
 def send_to_new_subscribers():
     # New subscribers list
@@ -18,16 +19,16 @@ def send_to_new_subscribers():
         print("❌ No output directory found.")
         return
 
-    files = sorted([f for f in os.listdir(output_dir) if f.endswith('.html')], reverse=True)
-    if not files:
+    index = ReportIndex(output_dir)
+    latest = index.latest()
+    if not latest:
         print("❌ No HTML reports found.")
         return
 
-    latest_report = os.path.join(output_dir, files[0])
+    latest_report = index.path_for(latest)
     print(f"📖 Reading latest report: {latest_report}")
     
-    with open(latest_report, "r") as f:
-        html_content = f.read()
+    html_content = index.read(latest)
 
     # 2. Send Email
     print("📧 Attempting to send email...")
@@ -37,7 +38,7 @@ def send_to_new_subscribers():
     sender.recipients = new_subs
     print(f"📋 Targeted Recipients: {sender.recipients}")
     
-    sender.send_report(html_content, "AI Daily Insight (New Subscriber Welcome)")
+    sender.send_report(html_content, "AI Daily Insight (New Subscriber Welcome)", report_id=latest['file'])
 
 if __name__ == "__main__":
     send_to_new_subscribers()
@@ -1,5 +1,6 @@
 import os
 import sys
+from datetime import datetime
 
 # Add parent directory to sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -31,7 +32,9 @@ def test_send():
     # Force reload subscribers from file/env to be sure
     print(f"📋 Recipients list: {sender.recipients}")
     
-    sender.send_report(html_content, "AI Daily Insight (Test)")
+    # A fresh id per run: a test send should always go out
+    sender.send_report(html_content, "AI Daily Insight (Test)",
+                       report_id=f"test-{datetime.now().strftime('%Y%m%d%H%M%S')}")
 
 if __name__ == "__main__":
     test_send()
@@ -6,28 +6,19 @@ import argparse
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from src.email_sender import EmailSender
+from src.report_index import ReportIndex
+from src.subscriber_store import SubscriberStore
 
 def add_subscriber_if_not_exists(email: str):
     """
-    Check if email exists in subscribers.txt, if not, append it.
+    Add email to the subscriber store (and subscribers.txt) unless it is already there.
     """
-    file_path = "subscribers.txt"
-    if not os.path.exists(file_path):
-        print("⚠️ subscribers.txt not found.")
-        return
-
-    with open(file_path, "r") as f:
-        lines = [line.strip() for line in f.readlines()]
-    
-    if email in lines:
+    store = SubscriberStore()
+    store.sync_file()
+    if store.add(email):
+        print(f"🆕 Added new user {email} to subscribers.txt.")
+    else:
         print(f"ℹ️ User {email} already exists in database. Skipping addition.")
-        return
-    
-    # Append new user
-    print(f"🆕 Adding new user {email} to database...")
-    with open(file_path, "a") as f:
-        f.write(f"{email}\n")
-    print("✅ User added to subscribers.txt")
 
 def send_welcome_email(user_email: str):
     """
@@ -44,18 +35,18 @@ def send_welcome_email(user_email: str):
         print("❌ No output directory found. Please run main.py first.")
         return
 
-    # Filter for standard HTML reports (not WeChat posts)
-    files = sorted([f for f in os.listdir(output_dir) if f.endswith('.html') and 'ai_news_report' in f], reverse=True)
+    # Standard HTML reports only (not WeChat posts)
+    index = ReportIndex(output_dir)
+    latest = index.latest("report")
     
-    if not files:
+    if not latest:
         print("❌ No HTML reports found.")
         return
 
-    latest_report = os.path.join(output_dir, files[0])
+    latest_report = index.path_for(latest)
     print(f"📖 Attaching latest report: {latest_report}")
     
-    with open(latest_report, "r") as f:
-        report_content = f.read()
+    report_content = index.read(latest)
 
     # 2. Construct Welcome Message (Prepend to report)
     welcome_header = f"""
@@ -79,7 +70,8 @@ def send_welcome_email(user_email: str):
     sender.recipients = [user_email]
     
     try:
-        sender.send_report(full_html, "Welcome to AI Daily News! 🎉")
+        # One welcome per subscriber per report, even if this script is re-run
+        sender.send_report(full_html, "Welcome to AI Daily News! 🎉", report_id=f"welcome-{latest['file']}")
         print(f"✅ Welcome email sent to {user_email}!")
     except Exception as e:
         print(f"❌ Failed to send welcome email: {e}")
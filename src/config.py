@@ -34,6 +34,14 @@ SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
 SMTP_USER = os.getenv("SMTP_USER")
 SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
 EMAIL_RECIPIENTS = os.getenv("EMAIL_RECIPIENTS", "").split(",")
+EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", "50"))  # Recipients per message (BCC)
+EMAIL_MAX_RETRIES = int(os.getenv("EMAIL_MAX_RETRIES", "3"))
+EMAIL_RETRY_BASE_DELAY = float(os.getenv("EMAIL_RETRY_BASE_DELAY", "2"))  # Seconds, doubled per retry
+
+# Outbox (durable email queue)
+OUTBOX_CONCURRENCY = int(os.getenv("OUTBOX_CONCURRENCY", "4"))
+RESEND_RATE_LIMIT = float(os.getenv("RESEND_RATE_LIMIT", "2"))  # Requests per second
+SMTP_RATE_LIMIT = float(os.getenv("SMTP_RATE_LIMIT", "1"))  # Messages per second
 
 # Report Configuration
 REPORT_OUTPUT_DIR = os.path.join(BASE_DIR, "output")
@@ -41,3 +49,43 @@ TEMPLATE_DIR = os.path.join(BASE_DIR, "templates")
 
 # Optimization
 TOKEN_SAVING_MODE = os.getenv("TOKEN_SAVING_MODE", "true").lower() == "true"
+
+# Report Storage
+# "plain": one standalone HTML file per report
+# "store": content-addressed store with shared CSS split out and optional compression
+REPORT_STORAGE = os.getenv("REPORT_STORAGE", "plain").lower()
+REPORT_COMPRESSION = os.getenv("REPORT_COMPRESSION", "gzip").lower()  # none / gzip / zstd
+REPORT_RETENTION_DAYS = int(os.getenv("REPORT_RETENTION_DAYS", "0"))  # 0 = keep forever
+
+# Deep Research
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "ddgs").lower()  # ddgs / stub (offline)
+RESEARCH_QUERIES = int(os.getenv("RESEARCH_QUERIES", "4"))  # Sub-queries per topic
+RESEARCH_RESULTS_PER_QUERY = int(os.getenv("RESEARCH_RESULTS_PER_QUERY", "5"))
+RESEARCH_MAX_SOURCES = int(os.getenv("RESEARCH_MAX_SOURCES", "12"))
+RESEARCH_TIME_BUDGET = float(os.getenv("RESEARCH_TIME_BUDGET", "45"))  # Seconds for search + fetch
+SEARCH_RATE_LIMIT = float(os.getenv("SEARCH_RATE_LIMIT", "1"))  # Requests per second per backend, shared
+SEARCH_CONCURRENCY = int(os.getenv("SEARCH_CONCURRENCY", "2"))  # Requests in flight per backend, shared
+
+# Search Cache
+SEARCH_CACHE_ENABLED = os.getenv("SEARCH_CACHE_ENABLED", "true").lower() == "true"
+SEARCH_CACHE_TTLS = {  # Seconds, per backend
+    "ddgs": int(os.getenv("SEARCH_CACHE_TTL_DDGS", "21600")),
+    "stub": int(os.getenv("SEARCH_CACHE_TTL_STUB", "86400")),
+}
+SEARCH_CACHE_NEGATIVE_TTL = int(os.getenv("SEARCH_CACHE_NEGATIVE_TTL", "600"))  # Empty searches / permanent failures
+TRENDING_CACHE_TTL = int(os.getenv("TRENDING_CACHE_TTL", "3600"))
+
+# Deep Report (map-reduce synthesis)
+DEEP_REPORT_CONTEXT_TOKENS = int(os.getenv("DEEP_REPORT_CONTEXT_TOKENS", "12000"))  # Source material per prompt
+DEEP_REPORT_MAP_WORKERS = int(os.getenv("DEEP_REPORT_MAP_WORKERS", "8"))
+
+# Content Factory
+CONTENT_FACTORY_CONCURRENCY = int(os.getenv("CONTENT_FACTORY_CONCURRENCY", "4"))  # Topics in parallel
+LLM_RATE_LIMIT = float(os.getenv("LLM_RATE_LIMIT", "2"))  # LLM requests per second, shared
+LLM_STREAMING = os.getenv("LLM_STREAMING", "true").lower() == "true"  # Stream completions into output files
+
+# Story Images (probe candidates, cache fixed-size thumbnails under output/images/)
+IMAGE_CACHE_ENABLED = os.getenv("IMAGE_CACHE_ENABLED", "true").lower() == "true"
+IMAGE_PROBE_BYTES = int(os.getenv("IMAGE_PROBE_BYTES", str(128 * 1024)))  # Max bytes read to find dimensions
+IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", str(10 * 1024 * 1024)))  # Larger source images are skipped
+IMAGE_MIN_WIDTH = int(os.getenv("IMAGE_MIN_WIDTH", "400"))
@@ -2,98 +2,135 @@
 import os
 import argparse
 import time
+import concurrent.futures
 from datetime import datetime
 from src.deep_research import DeepResearchFetcher
 from src.summarizer import NewsSummarizer
 from src.topic_manager import TopicManager
-from src.config import REPORT_OUTPUT_DIR
+from src.rate_limiter import RateLimiter
+from src.config import REPORT_OUTPUT_DIR, CONTENT_FACTORY_CONCURRENCY, LLM_RATE_LIMIT, LLM_STREAMING
 
-def generate_content_for_topic(topic: str, output_base_dir: str = REPORT_OUTPUT_DIR):
+def _save(path: str, content: str):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+def _generate_to_file(path: str, generate, *args, **kwargs) -> str:
+    """
+    Run a summarizer generate_* call, streaming tokens into `path` as they
+    arrive (when LLM_STREAMING is on). The file is rewritten with the final
+    result at the end, so an error message never leaves a half-written file.
+    """
+    if not LLM_STREAMING:
+        content = generate(*args, **kwargs)
+    else:
+        with open(path, "w", encoding="utf-8") as f:
+            def write(delta: str):
+                f.write(delta)
+                f.flush()
+            content = generate(*args, on_token=write, **kwargs)
+    _save(path, content)
+    return content
+
+def generate_content_for_topic(topic: str, output_base_dir: str = REPORT_OUTPUT_DIR,
+                               researcher: DeepResearchFetcher = None,
+                               summarizer: NewsSummarizer = None):
     """
     Automated Content Factory:
-    Topic -> Deep Research -> Report -> Viral PPT -> TikTok Script
+    Topic -> Deep Research -> Report -> (Viral PPT | TikTok Script)
+
+    Slides and script only depend on the report, so they run concurrently.
+    Pass shared `researcher` / `summarizer` instances when running a batch.
+    Returns the topic folder, or None if no research data was found.
     """
     print(f"\n🚀 [START] Processing topic: {topic}")
     
     # Initialize agents
-    researcher = DeepResearchFetcher()
-    summarizer = NewsSummarizer()
+    researcher = researcher or DeepResearchFetcher()
+    summarizer = summarizer or NewsSummarizer()
     
     # Create topic-specific folder
     safe_topic = "".join([c for c in topic if c.isalnum() or c in (' ', '-', '_')]).strip()[:50]
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     topic_dir = os.path.join(output_base_dir, f"{timestamp}_{safe_topic}")
-    if not os.path.exists(topic_dir):
-        os.makedirs(topic_dir)
+    os.makedirs(topic_dir, exist_ok=True)
     
     # 1. Deep Research
-    print("   [Phase 1] Deep Researching...")
+    print(f"   [Phase 1] Deep Researching '{topic}'...")
     research_data = researcher.research_topic(topic)
     if not research_data:
         print(f"   ❌ No data found for '{topic}'. Skipping.")
-        return
+        return None
 
     # 2. Generate Deep Report (The Base Material)
-    print("   [Phase 2] Generating Base Report...")
-    report_content = summarizer.generate_deep_report(topic, research_data)
-    
-    report_path = os.path.join(topic_dir, "1_report.md")
-    with open(report_path, "w", encoding="utf-8") as f:
-        f.write(report_content)
-    print(f"   ✅ Report saved.")
+    print(f"   [Phase 2] Generating Base Report for '{topic}'...")
+    report_content = _generate_to_file(os.path.join(topic_dir, "1_report.md"),
+                                       summarizer.generate_deep_report, topic, research_data)
+    print(f"   ✅ Report saved ({topic}).")
 
-    # 3. Generate Viral PPT (Marp)
-    print("   [Phase 3] Generating Viral PPT...")
-    ppt_content = summarizer.generate_marp_slides(topic, report_content, style="viral")
-    
-    ppt_path = os.path.join(topic_dir, "2_viral_slides.md")
-    with open(ppt_path, "w", encoding="utf-8") as f:
-        f.write(ppt_content)
-    print(f"   ✅ PPT Code saved.")
-    
-    # 4. Generate Video Script (TikTok)
-    print("   [Phase 4] Generating TikTok Script...")
-    script_content = summarizer.generate_video_script(topic, report_content, platform="tiktok")
-    
-    script_path = os.path.join(topic_dir, "3_tiktok_script.txt")
-    with open(script_path, "w", encoding="utf-8") as f:
-        f.write(script_content)
-    print(f"   ✅ Video Script saved.")
+    # 3 + 4. Viral PPT (Marp) and Video Script (TikTok), in parallel
+    print(f"   [Phase 3/4] Generating Viral PPT + TikTok Script for '{topic}'...")
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+        ppt_future = executor.submit(_generate_to_file, os.path.join(topic_dir, "2_viral_slides.md"),
+                                     summarizer.generate_marp_slides, topic, report_content, style="viral")
+        script_future = executor.submit(_generate_to_file, os.path.join(topic_dir, "3_tiktok_script.txt"),
+                                        summarizer.generate_video_script, topic, report_content, platform="tiktok")
+
+        ppt_future.result()
+        print(f"   ✅ PPT Code saved ({topic}).")
+        script_future.result()
+        print(f"   ✅ Video Script saved ({topic}).")
     
     print(f"🎉 [DONE] Content ready in: {topic_dir}")
+    return topic_dir
 
-def run_daily_batch(limit: int = 10):
+def run_daily_batch(limit: int = 10, concurrency: int = CONTENT_FACTORY_CONCURRENCY):
     """
-    Fetch trending topics and run content factory for each.
+    Fetch trending topics and run content factory for each, `concurrency`
+    topics at a time. All topics share one researcher (search cache, fetch
+    pool) and one summarizer whose LLM calls go through a shared rate limiter.
     """
-    print(f"🔥 Starting Daily Batch Run (Limit: {limit})")
+    print(f"🔥 Starting Daily Batch Run (Limit: {limit}, Concurrency: {concurrency})")
     
     tm = TopicManager()
     topics = tm.get_trending_topics(count=limit)
     
     print(f"📋 Today's Topics: {topics}")
-    
-    for i, topic in enumerate(topics, 1):
-        print(f"\n----------------------------------------")
-        print(f"Processing {i}/{len(topics)}: {topic}")
+
+    researcher = DeepResearchFetcher()
+    # Bursts up to one request per worker thread (topics x 2 parallel stages)
+    summarizer = NewsSummarizer(rate_limiter=RateLimiter(LLM_RATE_LIMIT, burst=max(1, concurrency) * 2))
+
+    def run(topic: str):
+        start = time.monotonic()
         try:
-            generate_content_for_topic(topic)
+            ok = generate_content_for_topic(topic, researcher=researcher, summarizer=summarizer) is not None
         except Exception as e:
             print(f"❌ Error processing '{topic}': {e}")
-        
-        # Avoid rate limits
-        time.sleep(2)
+            ok = False
+        return topic, ok, time.monotonic() - start
+
+    start = time.monotonic()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        results = list(executor.map(run, topics))
+
+    print(f"\n----------------------------------------")
+    for topic, ok, elapsed in results:
+        print(f"{'✅' if ok else '❌'} {elapsed:6.1f}s  {topic}")
+    done = sum(1 for _, ok, _ in results if ok)
+    print(f"🏁 Batch finished: {done}/{len(results)} topics in {time.monotonic() - start:.1f}s")
+    return results
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Viral Content Factory")
     parser.add_argument("--mode", type=str, default="single", choices=["single", "batch"], help="Mode: single or batch")
     parser.add_argument("--topic", type=str, help="Topic for single mode")
     parser.add_argument("--limit", type=int, default=10, help="Limit for batch mode")
+    parser.add_argument("--concurrency", type=int, default=CONTENT_FACTORY_CONCURRENCY, help="Topics processed in parallel (batch mode)")
     
     args = parser.parse_args()
     
     if args.mode == "batch":
-        run_daily_batch(limit=args.limit)
+        run_daily_batch(limit=args.limit, concurrency=args.concurrency)
     else:
         topic = args.topic if args.topic else "2025年春节消费降级现象与机会"
         generate_content_for_topic(topic)
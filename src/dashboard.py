@@ -3,14 +3,16 @@ import streamlit as st
 import sys
 import os
 import json
-import threading
+import time
 from datetime import datetime, timedelta
 
 # Add project root to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.main import run_daily_job
-from src.memory_manager import MemoryManager
+from src.memory_manager import MemoryManager, MEMORY_FILE
+from src.report_index import ReportIndex, INDEX_FILENAME
+from src.job_runner import get_job_runner, ACTIVE_STATES
 from src.config import RSS_FEEDS, EMAIL_RECIPIENTS
 from src.preferences import USER_INTERESTS, USER_DISLIKES
 from src.deep_research import DeepResearchFetcher
@@ -56,15 +58,49 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+DAILY_JOB = "daily_job"
+ARCHIVE_PAGE_SIZE = 20
+JOB_POLL_SECONDS = 2
+STREAM_RENDER_INTERVAL = 0.2  # Seconds between live deep-dive preview refreshes
+
 def run_agent_async():
-    """Run the agent in a separate thread"""
-    with st.spinner("🚀 Agent is running... This may take 1-2 minutes."):
-        try:
-            run_daily_job(hours=24)
-            st.success("✅ Agent finished successfully! Refreshing data...")
-            st.rerun()
-        except Exception as e:
-            st.error(f"❌ Error: {e}")
+    """Queue the agent on the shared background runner (joins an existing run if any)"""
+    job = get_job_runner().submit(DAILY_JOB, run_daily_job, hours=24)
+    st.session_state["watched_job"] = job["id"]
+    if job["status"] == "running":
+        st.info("ℹ️ A run is already in progress. Showing its status.")
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def render_live_job_status(job_id: str):
+    """Progress widget for an active job. Only this fragment reruns while polling."""
+    job = get_job_runner().get(job_id)
+    if not job or job["status"] not in ACTIVE_STATES:
+        # Finished: one full-page rerun so the report tabs pick up the new report
+        st.rerun()
+
+    st.info(f"🚀 Agent is running ({job['status']})...")
+    st.progress(job["progress"])
+    st.caption(job["message"])
+    with st.expander("📜 Progress Log", expanded=False):
+        st.text("\n".join(job["log"][-20:]))
+
+def render_job_status():
+    """Show the shared daily-job status (live-updating while the job is active)."""
+    job = get_job_runner().current(DAILY_JOB)
+    if not job:
+        return
+
+    if job["status"] in ACTIVE_STATES:
+        render_live_job_status(job["id"])
+        return
+
+    # Only announce completion to the session that was watching the run
+    if st.session_state.get("watched_job") == job["id"]:
+        if job["status"] == "succeeded":
+            st.success("✅ Agent finished successfully!")
+        else:
+            st.error(f"❌ Run {job['status']}: {job.get('error') or ''}")
+    st.caption(f"Last run: {job['status']} at {job.get('finished_at') or job['created_at']}")
 
 def generate_deep_dive(topic):
     """Run deep research and generation"""
@@ -74,7 +110,7 @@ def generate_deep_dive(topic):
     try:
         # 1. Search
         status_text.text(f"🔍 Searching web for '{topic}'...")
-        researcher = DeepResearchFetcher()
+        researcher = get_researcher()
         progress_bar.progress(20)
         
         # 2. Fetch Content
@@ -86,10 +122,22 @@ def generate_deep_dive(topic):
         status_text.text(f"📖 Reading {len(data)} articles...")
         progress_bar.progress(50)
         
-        # 3. Generate Report
+        # 3. Generate Report (streamed into a live preview)
         status_text.text("🧠 Synthesizing deep report...")
-        summarizer = NewsSummarizer()
-        report_md = summarizer.generate_deep_report(topic, data)
+        summarizer = get_summarizer()
+        preview = st.empty()
+        streamed = []
+        last_render = [0.0]
+
+        def on_token(delta: str):
+            streamed.append(delta)
+            # Re-rendering markdown per token is expensive; a few frames per second is enough
+            if time.monotonic() - last_render[0] > STREAM_RENDER_INTERVAL:
+                preview.markdown("".join(streamed) + " ▌")
+                last_render[0] = time.monotonic()
+
+        report_md = summarizer.generate_deep_report(topic, data, on_token=on_token)
+        preview.empty()
         progress_bar.progress(90)
         
         status_text.text("✅ Done!")
@@ -101,12 +149,50 @@ def generate_deep_dive(topic):
         st.error(f"Error: {e}")
         return None
 
-# --- Metrics Calculation ---
+# --- Cached Data Access ---
+# Streamlit re-runs this script on every interaction. Everything that touches
+# disk is cached and keyed on the source file's mtime, so a rerun only costs
+# a couple of stat() calls unless something actually changed.
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 report_dir = os.path.join(BASE_DIR, "output")
 
-mm = MemoryManager()
-history = mm.load_history(days=30)
+def file_mtime(path: str) -> float:
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0.0
+
+@st.cache_resource
+def get_summarizer():
+    return NewsSummarizer()
+
+@st.cache_resource
+def get_researcher():
+    return DeepResearchFetcher()
+
+@st.cache_data(max_entries=1)
+def load_history(days: int, mtime: float):
+    """`mtime` is only part of the cache key (one entry: older mtimes are dropped)."""
+    return MemoryManager().load_history(days=days)
+
+@st.cache_resource(max_entries=1)
+def get_report_index(output_dir: str, mtime: float):
+    """Re-loaded whenever output/index.json is rewritten; the superseded index is evicted."""
+    if not os.path.exists(output_dir):
+        return None
+    return ReportIndex(output_dir)
+
+@st.cache_data(max_entries=32)
+def load_report_html(_index: ReportIndex, filename: str, path: str, mtime: float) -> str:
+    """Report body, keyed by file name + path + mtime (the index itself is not hashed)."""
+    return _index.read(_index.get(filename))
+
+def read_report(index: ReportIndex, entry: dict) -> str:
+    path = index.path_for(entry)
+    return load_report_html(index, entry['file'], path, file_mtime(path))
+
+# --- Metrics Calculation ---
+history = load_history(30, file_mtime(MEMORY_FILE))
 total_reports = len(history)
 total_stories = sum(len(h.get('top_stories', [])) for h in history)
 last_run = history[-1]['date'] if history else "N/A"
@@ -121,6 +207,7 @@ with st.sidebar:
     st.subheader("⚡ Actions")
     if st.button("🚀 Trigger New Run", type="primary"):
         run_agent_async()
+    render_job_status()
     
     st.markdown("---")
     st.subheader("⚙️ Configuration")
@@ -157,21 +244,32 @@ st.markdown("---")
 
 tab1, tab2, tab3, tab4 = st.tabs(["📄 Latest Report", "💎 Deep Dive (Beta)", "🗄️ Archive", "🧠 Knowledge Graph"])
 
+report_index = get_report_index(report_dir, file_mtime(os.path.join(report_dir, INDEX_FILENAME)))
+
 with tab1:
     # Load latest report
-    if os.path.exists(report_dir):
-        files = sorted([f for f in os.listdir(report_dir) if f.endswith('.html')], reverse=True)
+    if report_index:
+        latest = report_index.latest()
         
-        if files:
-            latest_file = files[0]
-            file_path = os.path.join(report_dir, latest_file)
+        if latest:
+            latest_file = latest['file']
             
             col_a, col_b = st.columns([3, 1])
             with col_a:
-                st.subheader(f"📑 {latest_file}")
+                st.subheader(f"📑 {latest['title'] or latest_file}")
+                st.caption(f"{latest['generated_at']} · {latest_file}")
             with col_b:
-                with open(file_path, "r") as f:
-                    html_content = f.read()
+                show_full = st.toggle("Show full report", value=True)
+            
+            # Summary comes from the index; the body is read through the mtime-keyed
+            # cache, so showing it by default only costs a decompress on a new report
+            if latest.get('intro'):
+                st.info(latest['intro'])
+            for title in latest.get('top_stories', []):
+                st.markdown(f"- {title}")
+            
+            if show_full:
+                html_content = read_report(report_index, latest)
                 st.download_button(
                     label="📥 Download HTML",
                     data=html_content,
@@ -179,9 +277,8 @@ with tab1:
                     mime="text/html",
                     use_container_width=True
                 )
-            
-            # Preview (iframe)
-            st.components.v1.html(html_content, height=800, scrolling=True)
+                # Preview (iframe)
+                st.components.v1.html(html_content, height=800, scrolling=True)
         else:
             st.info("No reports found. Click 'Trigger New Run' to generate one.")
     else:
@@ -237,21 +334,46 @@ with tab2:
 
 with tab3:
     st.subheader("📜 Historical Reports")
-    if os.path.exists(report_dir):
-        files = sorted([f for f in os.listdir(report_dir) if f.endswith('.html')], reverse=True)
+    if report_index:
+        query = st.text_input("🔎 Search titles & summaries", placeholder="e.g. OpenAI agent")
+        
+        # Reset to the first page whenever the query changes
+        if st.session_state.get("archive_query") != query:
+            st.session_state["archive_query"] = query
+            st.session_state["archive_page"] = 0
+        page = st.session_state.get("archive_page", 0)
         
-        if files:
+        page_entries, total = report_index.search(query, offset=page * ARCHIVE_PAGE_SIZE, limit=ARCHIVE_PAGE_SIZE)
+        total_pages = max(1, -(-total // ARCHIVE_PAGE_SIZE))
+        
+        if page_entries:
             col_list, col_preview = st.columns([1, 2])
             
             with col_list:
-                selected_file = st.radio("Select Date", files, format_func=lambda x: x.replace("ai_news_report_", "").replace(".html", ""))
+                st.caption(f"{total} reports · page {page + 1}/{total_pages}")
+                selected_file = st.radio(
+                    "Select Date",
+                    [e['file'] for e in page_entries],
+                    format_func=lambda f: f"{report_index.get(f)['generated_at']} · {report_index.get(f)['title']}"
+                )
+                
+                col_prev, col_next = st.columns(2)
+                with col_prev:
+                    if st.button("← Newer", disabled=page == 0):
+                        st.session_state["archive_page"] = page - 1
+                        st.rerun()
+                with col_next:
+                    if st.button("Older →", disabled=page + 1 >= total_pages):
+                        st.session_state["archive_page"] = page + 1
+                        st.rerun()
                 
             with col_preview:
+                # Only the selected report body is ever read
                 if selected_file:
-                    file_path = os.path.join(report_dir, selected_file)
-                    with open(file_path, "r") as f:
-                        html_content = f.read()
+                    html_content = read_report(report_index, report_index.get(selected_file))
                     st.components.v1.html(html_content, height=600, scrolling=True)
+        elif query:
+            st.info(f"No reports match '{query}'.")
         else:
             st.info("No historical reports found.")
     else:
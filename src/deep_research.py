@@ -1,84 +1,149 @@
 # src/deep_research.py
-from duckduckgo_search import DDGS
-from .full_content_fetcher import FullContentFetcher
+import re
+import time
 import concurrent.futures
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from .full_content_fetcher import FullContentFetcher
+from .search_backends import SearchBackend, get_search_backend
+from .config import (
+    RESEARCH_QUERIES, RESEARCH_RESULTS_PER_QUERY, RESEARCH_MAX_SOURCES, RESEARCH_TIME_BUDGET
+)
+
+# Threads per research_topic call; each topic gets its own pool, so a slow
+# topic's leftover requests never queue ahead of the next topic's. Searches
+# from every pool still share one per-backend cap (see ThrottledBackend)
+RESEARCH_WORKERS = 8
+
+# Angles used to expand a topic into sub-queries
+CJK_ANGLES = ["最新进展", "深度分析", "数据 报告", "争议 观点", "行业影响"]
+LATIN_ANGLES = ["latest news", "analysis", "data statistics", "controversy debate", "industry impact"]
+
+TRACKING_PARAMS = re.compile(r'^(utm_\w+|spm|from|fbclid|gclid|ref|share_\w+)$', re.I)
+
+# Fallback Mock Data for Demo if search fails (common in local envs without VPN)
+MOCK_RESULTS = [
+    {
+        "title": "2025春节消费新趋势：年轻人更爱“平替”",
+        "href": "https://example.com/news1",
+        "body": "今年春节，高端白酒和奢侈品销量下滑，而平价餐饮和周边游火爆。数据显示..."
+    },
+    {
+        "title": "消费降级下的商机：二手交易平台流量暴增",
+        "href": "https://example.com/news2",
+        "body": "闲鱼等平台发布报告称，春节期间闲置物品交易量同比增长 40%..."
+    },
+    {
+        "title": "从“买买买”到“体验至上”：2025春节消费心理变迁",
+        "href": "https://example.com/news3",
+        "body": "消费者不再盲目追求大牌，而是更看重情绪价值和实际体验..."
+    }
+]
+
+def canonical_url(url: str) -> str:
+    """Normalize a URL for de-duplication (host case, www., tracking params, fragment, trailing slash)."""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query) if not TRACKING_PARAMS.match(k)))
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit(("https" if parts.scheme in ("http", "https") else parts.scheme, host, path, query, ""))
 
 class DeepResearchFetcher:
-    def __init__(self):
-        self.ddgs = DDGS()
+    def __init__(self, backend: SearchBackend = None, max_sources: int = RESEARCH_MAX_SOURCES,
+                 time_budget: float = RESEARCH_TIME_BUDGET):
+        self.backend = backend or get_search_backend()
         self.content_fetcher = FullContentFetcher()
+        self.max_sources = max_sources
+        self.time_budget = time_budget
+
+    def expand_queries(self, topic: str, count: int = RESEARCH_QUERIES) -> list:
+        """The topic itself plus a few angle-specific sub-queries."""
+        angles = CJK_ANGLES if re.search(r'[一-龥]', topic) else LATIN_ANGLES
+        return [topic] + [f"{topic} {angle}" for angle in angles[:max(0, count - 1)]]
 
     def search(self, query: str, max_results: int = 5) -> list:
         """
         Search for a topic and return raw results
         """
         print(f"🔍 Searching web for: {query}...")
-        results = []
         try:
-            # Search DuckDuckGo
-            ddg_results = self.ddgs.text(query, max_results=max_results)
-            if ddg_results:
-                results.extend(ddg_results)
+            return self.backend.text(query, max_results=max_results)
         except Exception as e:
-            print(f"Error searching DDG: {e}")
-            
-        # Fallback Mock Data for Demo if search fails (common in local envs without VPN)
-        if not results:
-            print("⚠️ Search failed or returned no results. Using Mock Data for Demo.")
-            results = [
-                {
-                    "title": "2025春节消费新趋势：年轻人更爱“平替”",
-                    "href": "https://example.com/news1",
-                    "body": "今年春节，高端白酒和奢侈品销量下滑，而平价餐饮和周边游火爆。数据显示..."
-                },
-                {
-                    "title": "消费降级下的商机：二手交易平台流量暴增",
-                    "href": "https://example.com/news2",
-                    "body": "闲鱼等平台发布报告称，春节期间闲置物品交易量同比增长 40%..."
-                },
-                {
-                    "title": "从“买买买”到“体验至上”：2025春节消费心理变迁",
-                    "href": "https://example.com/news3",
-                    "body": "消费者不再盲目追求大牌，而是更看重情绪价值和实际体验..."
-                }
-            ]
-        
-        return results
+            print(f"Error searching {self.backend.name}: {e}")
+            return []
+
+    def merge_results(self, result_lists: list) -> list:
+        """
+        Interleave per-query results (rank 1 of every query, then rank 2, ...)
+        and drop duplicates by canonical URL.
+        """
+        merged = []
+        seen = set()
+        for rank in range(max((len(r) for r in result_lists), default=0)):
+            for results in result_lists:
+                if rank >= len(results) or not results[rank].get("href"):
+                    continue
+                key = canonical_url(results[rank]["href"])
+                if key not in seen:
+                    seen.add(key)
+                    merged.append(results[rank])
+        return merged[:self.max_sources]
 
     def research_topic(self, topic: str) -> list:
         """
-        Full research pipeline: Search -> Fetch Content
+        Full research pipeline: Expand -> Search (parallel) -> Merge -> Fetch Content (parallel),
+        all within `time_budget` seconds.
         """
-        # 1. Search
-        search_results = self.search(topic, max_results=5)
+        deadline = time.monotonic() + self.time_budget
+        pool = concurrent.futures.ThreadPoolExecutor(max_workers=RESEARCH_WORKERS, thread_name_prefix="research")
+        try:
+            return self._research(topic, pool, deadline)
+        finally:
+            # Past the deadline: drop queued work and don't wait for requests still in flight
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def _research(self, topic: str, pool: concurrent.futures.ThreadPoolExecutor, deadline: float) -> list:
+        # 1. Search all sub-queries concurrently
+        queries = self.expand_queries(topic)
+        futures = [pool.submit(self.search, q, RESEARCH_RESULTS_PER_QUERY) for q in queries]
+        done, not_done = concurrent.futures.wait(futures, timeout=max(0, deadline - time.monotonic()))
+        for future in not_done:
+            future.cancel()
+        result_lists = [f.result() if f in done else [] for f in futures]
+
+        search_results = self.merge_results(result_lists)
+        print(f"🔗 {len(queries)} queries -> {sum(len(r) for r in result_lists)} hits -> {len(search_results)} unique sources")
+
         if not search_results:
-            return []
+            print("⚠️ Search failed or returned no results. Using Mock Data for Demo.")
+            search_results = MOCK_RESULTS
 
         # 2. Fetch Full Content in Parallel
         print(f"📖 Reading {len(search_results)} articles for deep dive...")
+        futures = [pool.submit(self.content_fetcher.fetch_details, res['href']) for res in search_results]
+        done, not_done = concurrent.futures.wait(futures, timeout=max(0, deadline - time.monotonic()))
+        for future in not_done:
+            future.cancel()
+        if not_done:
+            print(f"⏱️ Time budget reached: {len(not_done)} article(s) fall back to search snippets")
+
         detailed_results = []
-        
-        with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-            # Map futures to original result
-            future_to_result = {
-                executor.submit(self.content_fetcher.fetch_details, res['href']): res 
-                for res in search_results
-            }
-            
-            for future in concurrent.futures.as_completed(future_to_result):
-                original_res = future_to_result[future]
+        for res, future in zip(search_results, futures):
+            details = {}
+            if future in done:
                 try:
                     details = future.result()
-                    # Combine metadata with full text
-                    detailed_results.append({
-                        "title": original_res['title'],
-                        "link": original_res['href'],
-                        "source": "Web Search",
-                        "summary": original_res['body'], # Initial snippet
-                        "full_content": details.get("text", "")[:5000], # Limit text length
-                        "image": details.get("image")
-                    })
                 except Exception:
-                    continue
-                    
+                    pass
+            # Combine metadata with full text (the snippet stands in when the page was not read)
+            detailed_results.append({
+                "title": res['title'],
+                "link": res['href'],
+                "source": "Web Search",
+                "summary": res['body'], # Initial snippet
+                "full_content": (details.get("text") or res['body'])[:5000], # Limit text length
+                "image": details.get("image")
+            })
+
         return detailed_results
@@ -0,0 +1,293 @@
+# src/email_optimizer.py
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+from bs4 import BeautifulSoup, Comment
+from .config import BASE_DIR
+from .image_cache import ImageCache
+
+EMAIL_CACHE_DIR = os.path.join(BASE_DIR, "data", "email_cache")
+
+# Gmail clips messages whose HTML exceeds ~102KB
+GMAIL_CLIP_BYTES = 102 * 1024
+
+# Personalized digests add one payload per recipient per day, so both caches are bounded
+MEMORY_CACHE_ENTRIES = 32
+DISK_CACHE_MAX_FILES = 500
+DISK_CACHE_MAX_AGE_DAYS = 7
+
+# Bump when the transform changes so stale cached payloads are ignored
+OPTIMIZER_VERSION = 5
+
+# Whitespace between two of these tags never renders, so it can be dropped
+BLOCK_TAGS = (
+    "html|head|body|meta|link|title|style|div|p|h[1-6]|ul|ol|li|dl|dt|dd|table|thead|tbody|tfoot|tr|td|th|"
+    "section|article|header|footer|nav|main|aside|blockquote|figure|figcaption|hr|br|pre|center|form"
+)
+# <pre> blocks are matched first and kept verbatim
+BLOCK_GAP = re.compile(
+    rf'(<pre\b.*?</pre>)(?:\s+(?=</?(?:{BLOCK_TAGS})\b))?|(</?(?:{BLOCK_TAGS})\b[^>]*>)\s+(?=</?(?:{BLOCK_TAGS})\b)',
+    re.I | re.S
+)
+WHITESPACE_RUN = re.compile(r'(<pre\b.*?</pre>)|[ \t\r\n]+', re.I | re.S)
+
+_memory_cache: "OrderedDict[str, Dict]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+def _remember(key: str, payload: Dict):
+    """LRU insert into the in-process cache. Caller must hold _cache_lock."""
+    _memory_cache[key] = payload
+    _memory_cache.move_to_end(key)
+    while len(_memory_cache) > MEMORY_CACHE_ENTRIES:
+        _memory_cache.popitem(last=False)
+
+def prune_disk_cache(max_files: int = None, max_age_days: float = None) -> int:
+    """
+    Delete cached payloads older than `max_age_days`, then the least recently
+    used beyond `max_files` (defaults: DISK_CACHE_MAX_AGE_DAYS / DISK_CACHE_MAX_FILES).
+    """
+    max_files = DISK_CACHE_MAX_FILES if max_files is None else max_files
+    max_age_days = DISK_CACHE_MAX_AGE_DAYS if max_age_days is None else max_age_days
+    if not os.path.isdir(EMAIL_CACHE_DIR):
+        return 0
+    entries = []
+    for name in os.listdir(EMAIL_CACHE_DIR):
+        path = os.path.join(EMAIL_CACHE_DIR, name)
+        if name.endswith(".json") and os.path.isfile(path):
+            entries.append((os.path.getmtime(path), path))
+    entries.sort(reverse=True)
+
+    cutoff = time.time() - max_age_days * 86400
+    removed = 0
+    for i, (mtime, path) in enumerate(entries):
+        if i >= max_files or mtime < cutoff:
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+    return removed
+
+def _split_css_blocks(css: str) -> List[Tuple[str, str]]:
+    """Split a stylesheet into top-level (prelude, body) pairs, keeping @-blocks intact."""
+    blocks = []
+    depth = 0
+    start = 0
+    prelude = ""
+    for i, ch in enumerate(css):
+        if ch == "{":
+            if depth == 0:
+                prelude = css[start:i].strip()
+                start = i + 1
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                blocks.append((prelude, css[start:i].strip()))
+                start = i + 1
+    return blocks
+
+def _parse_declarations(body: str) -> List[Tuple[str, str]]:
+    decls = []
+    for part in body.split(";"):
+        if ":" in part:
+            prop, value = part.split(":", 1)
+            decls.append((prop.strip().lower(), value.strip()))
+    return decls
+
+def _specificity(selector: str) -> Tuple[int, int, int]:
+    """(ids, classes/attributes, element names) of a simple selector."""
+    ids = len(re.findall(r'#[\w-]+', selector))
+    classes = len(re.findall(r'\.[\w-]+|\[[^\]]*\]', selector))
+    types = len(re.findall(r'(?:^|[\s>+~])[a-zA-Z][\w-]*', selector))
+    return ids, classes, types
+
+def _minify_css(css: str) -> str:
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};:,>])\s*', r'\1', css)
+    return css.replace(";}", "}").strip()
+
+def inline_css(html: str) -> str:
+    """
+    Inline simple selector rules into style attributes, applied in cascade
+    order (specificity, then source order). Rules that cannot be inlined
+    (pseudo-classes, @media, ...) are kept in one minified <style>.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    css = ""
+    for style in soup.find_all("style"):
+        css += style.get_text() + "\n"
+        style.decompose()
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+
+    variables = {}
+    residual = []
+    styles: Dict[int, List[Tuple[Tuple[int, int, int], int, List[Tuple[str, str]]]]] = {}
+    elements = {}
+
+    for order, (prelude, body) in enumerate(_split_css_blocks(css)):
+        if prelude == ":root":
+            variables.update({p: v for p, v in _parse_declarations(body) if p.startswith("--")})
+            continue
+        if prelude.startswith("@"):
+            residual.append(f"{prelude}{{{body}}}")
+            continue
+
+        decls = _parse_declarations(body)
+        for selector in (s.strip() for s in prelude.split(",")):
+            if ":" in selector:
+                residual.append(f"{selector}{{{body}}}")
+                continue
+            try:
+                matched = soup.select(selector)
+            except Exception:
+                residual.append(f"{selector}{{{body}}}")
+                continue
+            specificity = _specificity(selector)
+            for el in matched:
+                elements[id(el)] = el
+                styles.setdefault(id(el), []).append((specificity, order, decls))
+
+    def resolve(value: str) -> str:
+        return re.sub(r'var\((--[\w-]+)\)', lambda m: variables.get(m.group(1), m.group(0)), value)
+
+    for key, el in elements.items():
+        merged = {}
+        for _, _, decls in sorted(styles[key], key=lambda rule: rule[:2]):
+            merged.update(decls)
+        # Existing inline style wins over stylesheet rules
+        merged.update(_parse_declarations(el.get("style", "")))
+        el["style"] = ";".join(f"{p}:{resolve(v)}" for p, v in merged.items())
+
+    # Inline styles that reference variables without matching any rule
+    for el in soup.find_all(style=re.compile(r'var\(')):
+        el["style"] = resolve(el["style"])
+
+    residual_css = resolve(_minify_css("".join(residual)))
+    used_classes = set(re.findall(r'\.([\w-]+)', residual_css))
+    for el in soup.find_all(class_=True):
+        kept = [c for c in el["class"] if c in used_classes]
+        if kept:
+            el["class"] = kept
+        else:
+            del el["class"]
+
+    if residual_css:
+        style_tag = soup.new_tag("style")
+        style_tag.string = residual_css
+        (soup.head or soup).insert(0, style_tag)
+
+    return str(soup)
+
+def minify_styles(html: str) -> str:
+    """Keep the stylesheet as-is, only with comments and whitespace removed."""
+    soup = BeautifulSoup(html, "html.parser")
+    for style in soup.find_all("style"):
+        style.string = _minify_css(re.sub(r'/\*.*?\*/', '', style.get_text(), flags=re.S))
+    return str(soup)
+
+def strip_markup(html: str) -> str:
+    """
+    Drop comments, scripts and event handlers, then collapse whitespace:
+    gaps between block-level tags are removed, other runs become one space
+    (it separates inline elements), and <pre> content is left untouched.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    for comment in soup.find_all(string=lambda s: isinstance(s, Comment)):
+        comment.extract()
+    for tag in soup.find_all("script"):
+        tag.decompose()
+    for tag in soup.find_all(True):
+        for attr in [a for a in tag.attrs if a.startswith("on")]:
+            del tag[attr]
+    html = BLOCK_GAP.sub(lambda m: m.group(1) or m.group(2), str(soup))
+    return WHITESPACE_RUN.sub(lambda m: m.group(1) or ' ', html).strip()
+
+def embed_images(html: str) -> Tuple[str, List[Dict]]:
+    """
+    Replace remote <img> sources with cid: references to email-sized
+    thumbnails from the shared ImageCache (already cached by the image
+    stage for report stories, so usually no download happens here).
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    images = []
+    image_cache = ImageCache()
+    for img in soup.find_all("img", src=re.compile(r'^https?://')):
+        path = (image_cache.fetch(img["src"]) or {}).get("email")
+        if not path:
+            continue
+        cid = os.path.splitext(os.path.basename(path))[0] + "@ai-daily"
+        if cid not in {i["cid"] for i in images}:
+            images.append({"cid": cid, "path": path, "mime": "image/jpeg"})
+        img["src"] = f"cid:{cid}"
+    return str(soup), images
+
+def optimize_email(html: str, inline_images: bool = True) -> Dict:
+    """
+    Pre-send transform: inline + minify CSS, strip unused markup and, if
+    requested, swap remote images for CID thumbnails.
+
+    Inlining copies a rule onto every element it matches, so for reports
+    with many repeated cards it can be larger than the stylesheet it
+    replaces. Both variants are built and the smaller one is used, so the
+    markup is never larger than the input.
+
+    Returns {"html", "images", "size", "original_size"}. Results are cached in
+    memory (LRU) and under data/email_cache/ (pruned by age and count), so
+    every batch and retry of the same report reuses the same payload.
+    """
+    key = hashlib.sha256(f"{OPTIMIZER_VERSION}:{int(inline_images)}:".encode("utf-8") + html.encode("utf-8")).hexdigest()
+    cache_path = os.path.join(EMAIL_CACHE_DIR, f"{key}.json")
+
+    # Only the lookup and the insert are locked; building a payload can download
+    # thumbnails, and other reports must not wait on that
+    with _cache_lock:
+        if key in _memory_cache:
+            _memory_cache.move_to_end(key)
+            return _memory_cache[key]
+        if os.path.exists(cache_path):
+            with open(cache_path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+            if all(os.path.exists(i["path"]) for i in payload["images"]):
+                # Touch so age-based pruning keeps payloads still in use
+                os.utime(cache_path)
+                _remember(key, payload)
+                return payload
+
+    candidates = [strip_markup(inline_css(html)), strip_markup(minify_styles(html)), html]
+    optimized = min(candidates, key=lambda c: len(c.encode("utf-8")))
+    images = []
+    if inline_images:
+        optimized, images = embed_images(optimized)
+
+    payload = {
+        "html": optimized,
+        "images": images,
+        "size": len(optimized.encode("utf-8")),
+        "original_size": len(html.encode("utf-8")),
+    }
+
+    with _cache_lock:
+        # Another thread may have built the same payload meanwhile
+        if key in _memory_cache:
+            return _memory_cache[key]
+        image_bytes = sum(os.path.getsize(i["path"]) for i in images)
+        print(f"📦 Email payload: {payload['size'] / 1024:.1f} KB HTML "
+              f"(was {payload['original_size'] / 1024:.1f} KB), "
+              f"{len(images)} inline image(s) {image_bytes / 1024:.1f} KB")
+        if payload["size"] > GMAIL_CLIP_BYTES:
+            print("⚠️ HTML exceeds ~102KB and will be clipped by Gmail.")
+
+        os.makedirs(EMAIL_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{cache_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False)
+        os.replace(tmp_path, cache_path)
+        prune_disk_cache()
+        _remember(key, payload)
+        return payload
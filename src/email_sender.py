@@ -4,9 +4,15 @@ import os
 import time
 import resend
 from email.mime.text import MIMEText
+from email.mime.image import MIMEImage
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime
-from .config import SMTP_SERVER, SMTP_PORT, SMTP_USER, SMTP_PASSWORD, EMAIL_RECIPIENTS, BASE_DIR
+from .config import (
+    SMTP_SERVER, SMTP_PORT, SMTP_USER, SMTP_PASSWORD, EMAIL_RECIPIENTS,
+    EMAIL_BATCH_SIZE, EMAIL_MAX_RETRIES, EMAIL_RETRY_BASE_DELAY
+)
+from .email_optimizer import optimize_email
+from .subscriber_store import SubscriberStore
 
 class EmailSender:
     def __init__(self):
@@ -15,97 +21,198 @@ class EmailSender:
         self.user = SMTP_USER
         self.password = SMTP_PASSWORD
         self.resend_key = os.getenv("RESEND_API_KEY")
-        
+        self.batch_size = max(1, EMAIL_BATCH_SIZE)
+        self.max_retries = max(1, EMAIL_MAX_RETRIES)
+        self.retry_base_delay = EMAIL_RETRY_BASE_DELAY
+        self._smtp = None  # Pooled SMTP session, reused across batches
+        self.rate_limiters = {}  # Optional provider name -> RateLimiter (set by the outbox worker)
+
         if self.resend_key:
             resend.api_key = self.resend_key
-        
+
         # Load recipients: Priority File > Env Var
         self.recipients = self._load_subscribers()
-        
+
     def _load_subscribers(self):
-        """Load emails from subscribers.txt if exists, else from .env"""
-        subs_file = os.path.join(BASE_DIR, "subscribers.txt")
+        """Load active emails from the subscriber store (synced from subscribers.txt), else from .env"""
         emails = []
-        
-        if os.path.exists(subs_file):
-            try:
-                with open(subs_file, "r") as f:
-                    emails = [line.strip() for line in f if line.strip() and "@" in line and not line.startswith("#")]
-            except Exception as e:
-                print(f"Error reading subscribers.txt: {e}")
-        
+        try:
+            store = SubscriberStore()
+            # Picks up edits to subscribers.txt (by hand or from another run); skipped while unchanged
+            changed = store.sync_file()
+            if changed:
+                print(f"📥 Synced {changed} subscriber(s) from subscribers.txt")
+            emails = list(store.iter_active())
+        except Exception as e:
+            print(f"Error loading subscribers: {e}")
+
         # Fallback to .env
         if not emails:
             emails = [r.strip() for r in EMAIL_RECIPIENTS if r.strip()]
-            
-        return list(set(emails)) # Dedup
 
-    def send_report(self, html_content: str, title: str):
+        return list(dict.fromkeys(emails)) # Dedup, keep order
+
+    # --- Transport ---
+
+    def _get_smtp(self) -> smtplib.SMTP:
+        """Return the pooled SMTP session, reconnecting if it has gone stale."""
+        if self._smtp is not None:
+            try:
+                if self._smtp.noop()[0] == 250:
+                    return self._smtp
+            except Exception:
+                pass
+            self.close()
+
+        server = smtplib.SMTP(self.server, self.port, timeout=30)
+        server.starttls()
+        server.login(self.user, self.password)
+        self._smtp = server
+        return server
+
+    def close(self):
+        """Close the pooled SMTP session (safe to call repeatedly)."""
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except Exception:
+                pass
+            self._smtp = None
+
+    def _throttle(self, provider: str):
+        limiter = self.rate_limiters.get(provider)
+        if limiter:
+            limiter.acquire()
+
+    def _send_batch_resend(self, batch: list, subject: str, html_content: str):
+        self._throttle("resend")
+        # Remote images stay remote here; only CSS/markup is optimized (cached)
+        payload = optimize_email(html_content, inline_images=False)
+        # Resend supports bulk sending; 'bcc' keeps the list private
+        params = {
+            "from": "AI Daily Agent <onboarding@resend.dev>", # Default test domain
+            "to": ["delivered@resend.dev"], # Placeholder for 'To' field
+            "bcc": batch,
+            "subject": subject,
+            "html": payload["html"]
+        }
+
+        # If user has verified domain, use it
+        if self.user and "@" in self.user and "gmail" not in self.user and "qq" not in self.user:
+             params["from"] = f"AI Daily Agent <{self.user}>"
+
+        r = resend.Emails.send(params)
+        print(f"✅ Batch sent via Resend ({len(batch)} recipients). ID: {r.get('id')}")
+
+    def _send_batch_smtp(self, batch: list, message: str):
+        self._throttle("smtp")
+        try:
+            # SMTP handles BCC automatically if recipients are not in 'To' header
+            refused = self._get_smtp().sendmail(self.user, batch, message)
+        except Exception:
+            # Force a fresh connection on the next attempt
+            self.close()
+            raise
+        if refused:
+            store = SubscriberStore()
+            for recipient in refused:
+                store.record_bounce(recipient)
+            print(f"⚠️ {len(refused)} recipient(s) refused by server: {', '.join(refused)}")
+        print(f"✅ Batch sent via SMTP ({len(batch)} recipients)")
+
+    def _send_batch(self, batch: list, subject: str, html_content: str, smtp_message: str) -> bool:
+        """Send one batch with retries and exponential backoff. Returns success."""
+        for attempt in range(self.max_retries):
+            # 1. Try Resend (If Configured)
+            if self.resend_key:
+                try:
+                    self._send_batch_resend(batch, subject, html_content)
+                    return True
+                except Exception as e:
+                    print(f"⚠️ Resend failed: {e}. Falling back to SMTP...")
+
+            # 2. Fallback to SMTP
+            if smtp_message is not None:
+                try:
+                    self._send_batch_smtp(batch, smtp_message)
+                    return True
+                except Exception as e:
+                    print(f"❌ Failed to send batch (Attempt {attempt+1}): {e}")
+
+            if attempt < self.max_retries - 1:
+                time.sleep(self.retry_base_delay * (2 ** attempt))
+
+        print(f"❌ Max retries reached for batch of {len(batch)} recipients.")
+        return False
+
+    @staticmethod
+    def build_subject(title: str) -> str:
+        return f"🤖 {title} - {datetime.now().strftime('%Y-%m-%d')}"
+
+    def can_send(self) -> bool:
+        return bool(self.resend_key or (self.user and self.password))
+
+    def _build_smtp_message(self, subject: str, html_content: str):
+        """MIME message string for SMTP, or None when SMTP is not configured."""
+        if not (self.user and self.password):
+            return None
+        payload = optimize_email(html_content)
+        # 'related' lets the HTML reference thumbnails by cid:
+        msg = MIMEMultipart('related')
+        msg['From'] = f"AI Daily Agent <{self.user}>"
+        # Use BCC to hide recipients list
+        msg['Subject'] = subject
+        msg.attach(MIMEText(payload["html"], 'html'))
+        for image in payload["images"]:
+            with open(image["path"], "rb") as f:
+                part = MIMEImage(f.read(), _subtype=image["mime"].split("/")[1])
+            part.add_header('Content-ID', f"<{image['cid']}>")
+            part.add_header('Content-Disposition', 'inline', filename=os.path.basename(image["path"]))
+            msg.attach(part)
+        message = msg.as_string()
+        print(f"📏 SMTP message size: {len(message) / 1024:.1f} KB")
+        return message
+
+    def deliver_batch(self, batch: list, subject: str, html_content: str) -> bool:
+        """Send one pre-built batch (used by the outbox worker). Returns success."""
+        return self._send_batch(batch, subject, html_content, self._build_smtp_message(subject, html_content))
+
+    def send_report(self, html_content: str, title: str, report_id: str):
         """
-        Send the HTML report via Resend (Preferred) or SMTP
+        Send the HTML report to `self.recipients` now, via the outbox.
+
+        The outbox's per-report delivery records are the only delivery state:
+        recipients already queued for `report_id` (a stable id such as the
+        report file name, not the subject or HTML) are not queued again, and
+        batches that failed are retried, so calling this again after a partial
+        failure only reaches recipients who have not received the report.
         """
+        # Imported here: the outbox builds on EmailSender
+        from .outbox import Outbox, OutboxWorker
+
         if not self.recipients:
             print("⚠️ No email recipients configured. Skipping email.")
             return
 
-        subject = f"🤖 {title} - {datetime.now().strftime('%Y-%m-%d')}"
-
-        # 1. Try Resend (If Configured)
-        if self.resend_key:
-            try:
-                print(f"📧 Sending via Resend API to {len(self.recipients)} recipients...")
-                # Resend supports bulk sending, but best practice is batching or BCC
-                # Here we use 'bcc' field for privacy
-                params = {
-                    "from": "AI Daily Agent <onboarding@resend.dev>", # Default test domain
-                    "to": ["delivered@resend.dev"], # Placeholder for 'To' field
-                    "bcc": self.recipients,
-                    "subject": subject,
-                    "html": html_content
-                }
-                
-                # If user has verified domain, use it
-                if self.user and "@" in self.user and "gmail" not in self.user and "qq" not in self.user:
-                     params["from"] = f"AI Daily Agent <{self.user}>"
-
-                r = resend.Emails.send(params)
-                print(f"✅ Email sent via Resend! ID: {r.get('id')}")
-                return
-            except Exception as e:
-                print(f"⚠️ Resend failed: {e}. Falling back to SMTP...")
-
-        # 2. Fallback to SMTP
-        if not self.user or not self.password:
+        if not self.can_send():
             print("⚠️ SMTP credentials not configured. Skipping email.")
             return
 
-        msg = MIMEMultipart()
-        msg['From'] = f"AI Daily Agent <{self.user}>"
-        # Use BCC to hide recipients list
-        msg['Subject'] = subject
-        
-        msg.attach(MIMEText(html_content, 'html'))
+        outbox = Outbox()
+        subject = self.build_subject(title)
+        added = outbox.enqueue(subject, html_content, self.recipients, self.batch_size, report_id)
+        print(f"📧 Queued {added} batch(es) for {len(self.recipients)} recipient(s)")
 
-        # Retry logic
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                print(f"📧 Sending via SMTP to {len(self.recipients)} recipients (Attempt {attempt+1})...")
-                with smtplib.SMTP(self.server, self.port) as server:
-                    server.starttls()
-                    server.login(self.user, self.password)
-                    # Send to list (SMTP handles BCC automatically if not in 'To' header)
-                    server.sendmail(self.user, self.recipients, msg.as_string())
-                print("✅ Email sent successfully via SMTP!")
-                return
-            except Exception as e:
-                print(f"❌ Failed to send email: {e}")
-                if attempt < max_retries - 1:
-                    time.sleep(5) # Wait before retry
-                else:
-                    print("❌ Max retries reached. Email sending failed.")
+        result = OutboxWorker(outbox, concurrency=1).drain(report_id=report_id)
+        if result["failed"]:
+            print(f"❌ Delivery incomplete: {result['failed']} batch(es) failed. Re-run to retry them.")
+        elif not added and not result["sent"]:
+            print("✅ All recipients already received this report. Nothing to send.")
+        else:
+            print("✅ Email sent successfully!")
 
 if __name__ == "__main__":
     # Test
     sender = EmailSender()
-    sender.send_report("<h1>Test Report</h1><p>This is a test.</p>", "Test Subject")
+    sender.send_report("<h1>Test Report</h1><p>This is a test.</p>", "Test Subject",
+                       report_id=f"test-{datetime.now().strftime('%Y%m%d%H%M%S')}")
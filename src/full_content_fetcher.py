@@ -12,11 +12,13 @@ class FullContentFetcher:
 
     def fetch_details(self, url: str) -> dict:
         """
-        Fetch full content and top image using newspaper3k/bs4
+        Fetch full content and top image using newspaper3k/bs4.
+        `images` lists every candidate image URL (best guess first) for the image stage.
         """
         result = {
             "text": "",
-            "image": None
+            "image": None,
+            "images": []
         }
         
         try:
@@ -28,8 +30,11 @@ class FullContentFetcher:
             if article.text and len(article.text) > 200:
                 result["text"] = article.text
             
-            if article.top_image:
-                result["image"] = article.top_image
+            for candidate in (article.top_image, article.meta_img):
+                if candidate and candidate not in result["images"]:
+                    result["images"].append(candidate)
+            if result["images"]:
+                result["image"] = result["images"][0]
 
             # Method 2: Fallback if text is empty or missing image
             if not result["text"] or not result["image"]:
@@ -43,11 +48,13 @@ class FullContentFetcher:
                     if len(text) > 100:
                         result["text"] = text
 
-                # Fallback Image (og:image)
+                # Fallback Image (og:image, twitter:image)
                 if not result["image"]:
-                    og_image = soup.find("meta", property="og:image")
-                    if og_image and og_image.get("content"):
-                        result["image"] = og_image["content"]
+                    for meta in (soup.find("meta", property="og:image"), soup.find("meta", attrs={"name": "twitter:image"})):
+                        if meta and meta.get("content") and meta["content"] not in result["images"]:
+                            result["images"].append(meta["content"])
+                    if result["images"]:
+                        result["image"] = result["images"][0]
 
             return result
             
@@ -80,9 +87,11 @@ class FullContentFetcher:
                     
                     # Update Image
                     item['image'] = details["image"]
+                    item['image_candidates'] = details["images"]
                         
                 except Exception:
                     item['full_content'] = item['summary']
                     item['image'] = None
+                    item['image_candidates'] = []
         
         return news_items
@@ -0,0 +1,205 @@
+# src/image_cache.py
+import os
+import io
+import re
+import json
+import struct
+import hashlib
+import threading
+import concurrent.futures
+import requests
+from typing import Dict, List, Optional, Tuple
+from .config import BASE_DIR, IMAGE_PROBE_BYTES, IMAGE_MAX_BYTES, IMAGE_MIN_WIDTH
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+# Kept out of output/ (which the daily workflow commits): thumbnails are a local cache
+IMAGE_CACHE_DIR = os.path.join(BASE_DIR, "data", "image_cache")
+
+# Fixed output sizes: "card" fills the 200px-high report card at 2x, "thumb" is for lists,
+# "email" is the CID attachment for the ~600px-wide email layout
+IMAGE_SIZES = {"card": (1200, 480), "thumb": (320, 200), "email": (600, 240)}
+IMAGE_QUALITY = 72
+
+# Candidates wider or taller than this are treated as banners / strips
+MAX_ASPECT_RATIO = 3.0
+# Area beyond which a bigger source no longer improves the thumbnail
+TARGET_AREA = 1600 * 900
+
+HEADERS = {"User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36"}
+
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+def image_dimensions(data: bytes) -> Optional[Tuple[int, int]]:
+    """(width, height) from the first bytes of a PNG, GIF, WebP or JPEG, or None if not found yet."""
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and len(data) >= 24:
+        return struct.unpack(">II", data[16:24])
+    if data[:6] in (b"GIF87a", b"GIF89a") and len(data) >= 10:
+        return struct.unpack("<HH", data[6:10])
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP" and len(data) >= 30:
+        chunk = data[12:16]
+        if chunk == b"VP8 ":
+            width, height = struct.unpack("<HH", data[26:30])
+            return width & 0x3FFF, height & 0x3FFF
+        if chunk == b"VP8L":
+            bits = int.from_bytes(data[21:25], "little")
+            return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        if chunk == b"VP8X":
+            return int.from_bytes(data[24:27], "little") + 1, int.from_bytes(data[27:30], "little") + 1
+    if data[:2] == b"\xff\xd8":
+        # Walk the segment list until a start-of-frame marker
+        i = 2
+        while i + 9 <= len(data):
+            if data[i] != 0xFF:
+                return None
+            marker = data[i + 1]
+            if marker == 0xFF:
+                i += 1
+                continue
+            if marker in JPEG_SOF_MARKERS:
+                height, width = struct.unpack(">HH", data[i + 5:i + 9])
+                return width, height
+            i += 2 + struct.unpack(">H", data[i + 2:i + 4])[0]
+    return None
+
+def probe_image(url: str) -> Optional[Dict]:
+    """
+    Learn an image's size and dimensions without downloading it: a Range
+    request for the first IMAGE_PROBE_BYTES, read only until the header parses.
+    Returns {"url", "width", "height", "bytes"} (bytes may be None) or None.
+    """
+    headers = dict(HEADERS, Range=f"bytes=0-{IMAGE_PROBE_BYTES - 1}")
+    try:
+        with requests.get(url, headers=headers, timeout=10, stream=True) as response:
+            response.raise_for_status()
+            if response.status_code == 206:
+                total = re.search(r'/(\d+)$', response.headers.get("Content-Range", ""))
+                size = int(total.group(1)) if total else None
+            else:
+                # Server ignored Range: Content-Length is the full size
+                size = int(response.headers["Content-Length"]) if response.headers.get("Content-Length") else None
+
+            data = b""
+            dimensions = None
+            for chunk in response.iter_content(4096):
+                data += chunk
+                dimensions = image_dimensions(data)
+                if dimensions or len(data) >= IMAGE_PROBE_BYTES:
+                    break
+    except Exception:
+        return None
+
+    if not dimensions:
+        return None
+    return {"url": url, "width": dimensions[0], "height": dimensions[1], "bytes": size}
+
+def select_image(probes: List[Optional[Dict]]) -> Optional[Dict]:
+    """
+    Best usable candidate: wide enough, not a banner or strip, not heavier
+    than IMAGE_MAX_BYTES. Prefers the largest area up to TARGET_AREA, then the lighter file.
+    """
+    usable = [
+        p for p in probes
+        if p and p["width"] >= IMAGE_MIN_WIDTH and p["height"] > 0
+        and 1 / MAX_ASPECT_RATIO <= p["width"] / p["height"] <= MAX_ASPECT_RATIO
+        and (p["bytes"] is None or p["bytes"] <= IMAGE_MAX_BYTES)
+    ]
+    return max(usable, key=lambda p: (min(p["width"] * p["height"], TARGET_AREA), -(p["bytes"] or 0)), default=None)
+
+class ImageCache:
+    """
+    Content-addressed thumbnail cache under data/image_cache/.
+
+    Each source image is downloaded once, hashed, and written at every
+    IMAGE_SIZES entry as <sha[:2]>/<sha>_<size>.jpg. A URL -> hash
+    index avoids downloading the same URL again; identical images served from
+    different URLs share files.
+    """
+    def __init__(self, root: str = IMAGE_CACHE_DIR):
+        self.root = root
+        self.index_path = os.path.join(root, "index.json")
+        self._lock = threading.Lock()
+        self._index = {}
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, "r", encoding="utf-8") as f:
+                    self._index = json.load(f)
+            except (OSError, ValueError):
+                self._index = {}
+
+    def _paths(self, digest: str) -> Dict[str, str]:
+        return {name: os.path.join(self.root, digest[:2], f"{digest}_{name}.jpg") for name in IMAGE_SIZES}
+
+    def _save_index(self):
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = f"{self.index_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._index, f, ensure_ascii=False, indent=0, sort_keys=True)
+        os.replace(tmp_path, self.index_path)
+
+    def fetch(self, url: str) -> Optional[Dict[str, str]]:
+        """{size name: absolute path} for `url`, downloading and resizing only on a miss."""
+        if Image is None:
+            return None
+
+        with self._lock:
+            digest = self._index.get(url)
+        if digest:
+            paths = self._paths(digest)
+            if all(os.path.exists(p) for p in paths.values()):
+                return paths
+
+        try:
+            response = requests.get(url, headers=HEADERS, timeout=15, stream=True)
+            response.raise_for_status()
+            data = response.raw.read(IMAGE_MAX_BYTES + 1, decode_content=True)
+            if len(data) > IMAGE_MAX_BYTES:
+                return None
+
+            digest = hashlib.sha256(data).hexdigest()
+            paths = self._paths(digest)
+            if not all(os.path.exists(p) for p in paths.values()):
+                image = Image.open(io.BytesIO(data)).convert("RGB")
+                os.makedirs(os.path.dirname(paths["card"]), exist_ok=True)
+                for name, size in IMAGE_SIZES.items():
+                    tmp_path = f"{paths[name]}.{threading.get_ident()}.tmp"
+                    ImageOps.fit(image, size, Image.LANCZOS).save(tmp_path, "JPEG", quality=IMAGE_QUALITY,
+                                                                 optimize=True, progressive=True)
+                    os.replace(tmp_path, paths[name])
+        except Exception as e:
+            print(f"⚠️ Could not cache image {url[:60]}: {e}")
+            return None
+
+        with self._lock:
+            self._index[url] = digest
+            self._save_index()
+        return paths
+
+    def attach(self, story: Dict) -> Dict:
+        """
+        Probe the story's candidate images, keep the best as `image` and add
+        `image_files`: {size name: local thumbnail path}. Stored reports keep
+        the remote `image` URL (thumbnails are machine-local and not committed);
+        emails attach the cached thumbnails at send time.
+        When no candidate probes as usable, `image` keeps the original URL.
+        """
+        candidates = list(dict.fromkeys(u for u in story.get("image_candidates") or [story.get("image")] if u))
+        best = select_image([probe_image(url) for url in candidates])
+        story["image"] = best["url"] if best else (story.get("image") or next(iter(candidates), None))
+        story["image_files"] = {}
+        if best:
+            paths = self.fetch(best["url"]) or {}
+            story["image_files"] = paths
+        return story
+
+    def process(self, stories: List[Dict], workers: int = 8) -> List[Dict]:
+        """Attach images to all stories in parallel."""
+        print(f"🖼️ Probing images for {len(stories)} stories...")
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(self.attach, stories))
+        cached = sum(1 for s in stories if s.get("image_files"))
+        print(f"🖼️ {cached}/{len(stories)} stories have a cached image")
+        return stories
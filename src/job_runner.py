@@ -0,0 +1,167 @@
+# src/job_runner.py
+import os
+import json
+import queue
+import uuid
+import tempfile
+import threading
+import traceback
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+JOBS_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "jobs.json")
+MAX_JOB_HISTORY = 20
+
+ACTIVE_STATES = ("queued", "running")
+
+class JobRunner:
+    """
+    Background job runner shared by every dashboard session in the process.
+
+    - One worker thread drains a FIFO job queue.
+    - Single-flight: submitting a job whose name is already queued/running
+      returns the existing job instead of starting a duplicate.
+    - Job status and progress are persisted to data/jobs.json so every
+      session (and a restarted process) sees the same state.
+    """
+    def __init__(self, jobs_file: str = JOBS_FILE):
+        self.jobs_file = jobs_file
+        self.lock = threading.Lock()
+        self.queue = queue.Queue()
+        self.jobs = self._load()
+        self.worker = threading.Thread(target=self._worker_loop, name="job-runner", daemon=True)
+        self.worker.start()
+
+    def _load(self) -> Dict[str, Dict]:
+        if not os.path.exists(self.jobs_file):
+            return {}
+        try:
+            with open(self.jobs_file, 'r', encoding='utf-8') as f:
+                jobs = json.load(f)
+        except Exception as e:
+            print(f"⚠️ Error loading job status: {e}")
+            return {}
+
+        # Anything still active belonged to a previous process
+        for job in jobs.values():
+            if job["status"] in ACTIVE_STATES:
+                job["status"] = "interrupted"
+                job["finished_at"] = job.get("finished_at") or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        return jobs
+
+    def _save(self):
+        """Persist job table atomically. Caller must hold self.lock."""
+        # Keep only the most recent jobs
+        ordered = sorted(self.jobs.values(), key=lambda j: j["created_at"])
+        self.jobs = {j["id"]: j for j in ordered[-MAX_JOB_HISTORY:]}
+
+        dirname = os.path.dirname(self.jobs_file)
+        os.makedirs(dirname, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=dirname, prefix=".jobs-", suffix=".json")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self.jobs, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.jobs_file)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def submit(self, name: str, func: Callable, **kwargs) -> Dict:
+        """
+        Queue `func(progress=..., **kwargs)` unless a job with the same name is
+        already active, in which case that job is returned.
+        """
+        with self.lock:
+            active = self._active_job(name)
+            if active:
+                return dict(active)
+
+            job = {
+                "id": uuid.uuid4().hex[:12],
+                "name": name,
+                "status": "queued",
+                "progress": 0,
+                "message": "Waiting for worker...",
+                "log": [],
+                "error": None,
+                "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "started_at": None,
+                "finished_at": None,
+            }
+            self.jobs[job["id"]] = job
+            self._save()
+
+        self.queue.put((job["id"], func, kwargs))
+        return dict(job)
+
+    def _active_job(self, name: str) -> Optional[Dict]:
+        for job in self.jobs.values():
+            if job["name"] == name and job["status"] in ACTIVE_STATES:
+                return job
+        return None
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def current(self, name: str) -> Optional[Dict]:
+        """The active job for `name`, else the most recent finished one."""
+        with self.lock:
+            active = self._active_job(name)
+            if active:
+                return dict(active)
+            finished = [j for j in self.jobs.values() if j["name"] == name]
+            if not finished:
+                return None
+            return dict(max(finished, key=lambda j: j["created_at"]))
+
+    def _update(self, job_id: str, **fields):
+        with self.lock:
+            job = self.jobs[job_id]
+            message = fields.get("message")
+            if message and message != job["message"]:
+                job["log"].append(f"[{datetime.now().strftime('%H:%M:%S')}] {message}")
+            job.update(fields)
+            self._save()
+
+    def _worker_loop(self):
+        while True:
+            job_id, func, kwargs = self.queue.get()
+
+            def progress(percent: int, message: str):
+                self._update(job_id, progress=percent, message=message)
+
+            self._update(job_id, status="running", message="Started",
+                         started_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            try:
+                result = func(progress=progress, **kwargs)
+                if result:
+                    self._update(job_id, status="succeeded", progress=100, message="Finished",
+                                 finished_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+                else:
+                    # Jobs signal success with a truthy result (e.g. the report path);
+                    # None / False means they stopped early after logging why
+                    with self.lock:
+                        stage = self.jobs[job_id]["message"]
+                    error = f"Stopped early during: {stage}"
+                    self._update(job_id, status="failed", error=error, message=f"Failed: {error}",
+                                 finished_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            except Exception as e:
+                traceback.print_exc()
+                self._update(job_id, status="failed", error=str(e), message=f"Failed: {e}",
+                             finished_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            finally:
+                self.queue.task_done()
+
+_runner = None
+_runner_lock = threading.Lock()
+
+def get_job_runner() -> JobRunner:
+    """Process-wide runner (module state is shared across Streamlit sessions)."""
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = JobRunner()
+        return _runner
@@ -2,6 +2,9 @@
 import argparse
 import os
 import sys
+import tempfile
+import subprocess
+from datetime import datetime
 
 # Add current directory to path so imports work
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -10,23 +13,39 @@ from src.fetcher import NewsFetcher
 from src.full_content_fetcher import FullContentFetcher
 from src.summarizer import NewsSummarizer
 from src.reporter import Reporter
-from src.email_sender import EmailSender
+from src.report_index import ReportIndex
+from src.image_cache import ImageCache
+from src.config import IMAGE_CACHE_ENABLED
+from src.outbox import enqueue_report, OutboxWorker
+
+def run_daily_job(hours=24, send_email=False, progress=None):
+    """
+    Run the full pipeline. `progress(percent, message)` is an optional
+    callback used by the dashboard's background job runner.
+
+    Returns the report path, or None when the run stopped early (no news,
+    fetch / summary / report failure) so callers can tell it did not succeed.
+    """
+    def report_progress(percent, message):
+        if progress:
+            progress(percent, message)
 
-def run_daily_job(hours=24, send_email=False):
     print("🚀 Starting Daily AI News Agent...")
     
     # 1. Fetch RSS
+    report_progress(5, "Fetching RSS feeds...")
     try:
         fetcher = NewsFetcher()
         news_items = fetcher.fetch_all(hours_back=hours)
         if not news_items:
             print("No news found in the specified time range.")
-            return
+            return None
     except Exception as e:
         print(f"Error fetching news: {e}")
-        return
+        return None
 
     # 2. Enrich with Full Content
+    report_progress(25, f"Reading {len(news_items)} articles...")
     try:
         content_fetcher = FullContentFetcher()
         news_items = content_fetcher.enrich_news_items(news_items)
@@ -34,32 +53,43 @@ def run_daily_job(hours=24, send_email=False):
         print(f"Error enriching news content: {e}")
     
     # 3. Summarize
+    report_progress(50, "Analyzing and summarizing news...")
     try:
         print("🧠 Analyzing and summarizing news (this may take a moment)...")
         summarizer = NewsSummarizer()
         summary_data = summarizer.summarize(news_items)
         if not summary_data:
             print("Failed to generate summary.")
-            return
+            return None
     except Exception as e:
         print(f"Error summarizing news: {e}")
-        return
+        return None
+
+    # 4. Story Images (probe candidates, cache fixed-size thumbnails)
+    if IMAGE_CACHE_ENABLED:
+        report_progress(80, "Caching story images...")
+        try:
+            ImageCache().process(summary_data.get("top_stories", []))
+        except Exception as e:
+            print(f"⚠️ Image stage failed, reports will hotlink images: {e}")
 
-    # 4. Report & Email
+    # 5. Report & Email
+    report_progress(85, "Generating report...")
     try:
         print("📝 Generating report...")
         reporter = Reporter()
         report_path = reporter.generate_report(summary_data)
         
-        # Read HTML content for email
-        with open(report_path, 'r', encoding='utf-8') as f:
-            html_content = f.read()
+        # Read HTML content for email (decompresses stored reports)
+        html_content = reporter.read_report(report_path)
 
-        # Send Email
+        # Queue Email (delivered by the outbox worker, not inline)
         if send_email:
-            print("📧 Sending email report...")
-            email_sender = EmailSender()
-            email_sender.send_report(html_content, summary_data.get('title', 'AI Daily News'))
+            print("📧 Queueing email report...")
+            # One daily report per run date: re-running the same day never emails anyone twice
+            report_id = f"daily-{datetime.now().strftime('%Y-%m-%d')}"
+            enqueue_report(html_content, summary_data.get('title', 'AI Daily News'),
+                           summary_data=summary_data, report_id=report_id)
 
         # Also print a quick markdown summary to console
         md_summary = reporter.generate_markdown(summary_data)
@@ -80,10 +110,19 @@ def run_daily_job(hours=24, send_email=False):
             
             # Try to open the report automatically on macOS
             if sys.platform == 'darwin' and not send_email: # Don't popup if running in automation
-                os.system(f"open '{report_path}'")
+                preview_path = report_path
+                if not ReportIndex.parse_filename(os.path.basename(report_path)):
+                    # Stored reports are compressed store objects: open a rendered copy instead
+                    fd, preview_path = tempfile.mkstemp(prefix="ai_news_report_", suffix=".html")
+                    with os.fdopen(fd, "w", encoding="utf-8") as f:
+                        f.write(html_content)
+                subprocess.run(["open", preview_path], check=False)
                 
     except Exception as e:
         print(f"Error generating report: {e}")
+        return None
+
+    return report_path
 
 def main():
     parser = argparse.ArgumentParser(description="Daily AI News Agent")
@@ -92,5 +131,9 @@ def main():
     args = parser.parse_args()
     run_daily_job(args.hours, send_email=args.email)
 
+    # Deliver queued emails once the report is done (also resumes earlier unsent batches)
+    if args.email:
+        OutboxWorker().drain()
+
 if __name__ == "__main__":
     main()
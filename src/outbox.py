@@ -0,0 +1,311 @@
+# src/outbox.py
+import os
+import sys
+import json
+import sqlite3
+import hashlib
+import argparse
+import threading
+import concurrent.futures
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import List, Dict, Optional
+
+# Allow running as `python src/outbox.py`
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config import BASE_DIR, OUTBOX_CONCURRENCY, RESEND_RATE_LIMIT, SMTP_RATE_LIMIT
+from src.rate_limiter import RateLimiter
+from src.email_sender import EmailSender
+from src.personalization import load_profiles, render_digests
+
+OUTBOX_DB = os.path.join(BASE_DIR, "data", "outbox.db")
+
+# A message stuck in 'sending' longer than this is assumed lost (worker crash)
+SENDING_LEASE_SECONDS = 600
+MAX_MESSAGE_AGE_HOURS = 48
+# Failed batches are re-queued automatically on every drain until they have been tried this often
+MAX_SEND_ATTEMPTS = 5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    subject TEXT NOT NULL,
+    html TEXT NOT NULL,
+    recipients TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_messages_status ON messages(status, updated_at);
+CREATE TABLE IF NOT EXISTS deliveries (
+    report_id TEXT NOT NULL,
+    email TEXT NOT NULL,
+    message_id INTEGER NOT NULL,
+    PRIMARY KEY (report_id, email)
+);
+"""
+
+def _now() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+class Outbox:
+    """
+    Disk-backed (SQLite) queue of outbound email batches.
+
+    Each row is one BCC batch with a unique idempotency key, so enqueueing the
+    same report twice is a no-op and a sent batch is never sent again.
+
+    Keys come from the report's identity (its dated subject by default), not
+    the rendered HTML, which embeds a generation timestamp: re-running the job
+    regenerates the report but must not email anyone a second time. Every
+    queued recipient is recorded per report, so a changed subscriber list
+    only queues the newcomers.
+    """
+    def __init__(self, db_path: str = OUTBOX_DB):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with self._db() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    @contextmanager
+    def _db(self):
+        """Autocommit connection that is always closed."""
+        conn = self._connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def make_key(report_id: str, recipients: List[str]) -> str:
+        digest = hashlib.sha256()
+        for part in (report_id, ",".join(sorted(recipients))):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def enqueue(self, subject: str, html_content: str, recipients: List[str],
+                batch_size: int = 50, report_id: str = None) -> int:
+        """
+        Split recipients not yet queued for `report_id` (default: the subject)
+        into batches and enqueue them. Returns number of new rows.
+        """
+        report_id = report_id or subject
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            queued = {row["email"] for row in conn.execute(
+                "SELECT email FROM deliveries WHERE report_id = ?", (report_id,)
+            )}
+            recipients = sorted(set(recipients) - queued)
+            batches = [recipients[i:i + batch_size] for i in range(0, len(recipients), batch_size)]
+            added = 0
+            for batch in batches:
+                cur = conn.execute(
+                    "INSERT OR IGNORE INTO messages (idempotency_key, subject, html, recipients, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (self.make_key(report_id, batch), subject, html_content,
+                     json.dumps(batch), _now(), _now())
+                )
+                if cur.rowcount:
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO deliveries (report_id, email, message_id) VALUES (?, ?, ?)",
+                        ((report_id, email, cur.lastrowid) for email in batch)
+                    )
+                added += cur.rowcount
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return added
+
+    def claim(self, limit: int, report_id: Optional[str] = None) -> List[Dict]:
+        """
+        Atomically move up to `limit` pending (or lease-expired) rows to 'sending',
+        only rows queued for `report_id` when given.
+        """
+        lease_cutoff = (datetime.now() - timedelta(seconds=SENDING_LEASE_SECONDS)).strftime("%Y-%m-%d %H:%M:%S")
+        query = "SELECT * FROM messages WHERE (status = 'pending' OR (status = 'sending' AND updated_at < ?))"
+        params = [lease_cutoff]
+        if report_id is not None:
+            query += " AND id IN (SELECT message_id FROM deliveries WHERE report_id = ?)"
+            params.append(report_id)
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(query + " ORDER BY id LIMIT ?", params + [limit]).fetchall()
+            for row in rows:
+                conn.execute(
+                    "UPDATE messages SET status = 'sending', attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                    (_now(), row["id"])
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return [dict(row, recipients=json.loads(row["recipients"])) for row in rows]
+
+    def mark(self, message_id: int, status: str, error: Optional[str] = None):
+        with self._db() as conn:
+            conn.execute(
+                "UPDATE messages SET status = ?, last_error = ?, updated_at = ? WHERE id = ?",
+                (status, error, _now(), message_id)
+            )
+
+    def expire_old(self, max_age_hours: int = MAX_MESSAGE_AGE_HOURS) -> int:
+        """Stop retrying messages that are too old to be worth sending."""
+        cutoff = (datetime.now() - timedelta(hours=max_age_hours)).strftime("%Y-%m-%d %H:%M:%S")
+        with self._db() as conn:
+            cur = conn.execute(
+                "UPDATE messages SET status = 'expired', updated_at = ? "
+                "WHERE status IN ('pending', 'failed') AND created_at < ?",
+                (_now(), cutoff)
+            )
+            return cur.rowcount
+
+    def retry_failed(self, max_attempts: Optional[int] = None) -> int:
+        """Re-queue failed messages (only those tried fewer than `max_attempts` times, if given)."""
+        with self._db() as conn:
+            if max_attempts is None:
+                cur = conn.execute("UPDATE messages SET status = 'pending', updated_at = ? WHERE status = 'failed'", (_now(),))
+            else:
+                cur = conn.execute(
+                    "UPDATE messages SET status = 'pending', updated_at = ? WHERE status = 'failed' AND attempts < ?",
+                    (_now(), max_attempts)
+                )
+            return cur.rowcount
+
+    def stats(self) -> Dict[str, int]:
+        with self._db() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM messages GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+class OutboxWorker:
+    """
+    Drains the outbox with a thread pool. Every thread owns its own
+    EmailSender (SMTP sessions are not thread-safe); provider rate limits
+    are shared across threads.
+    """
+    def __init__(self, outbox: Outbox = None, concurrency: int = OUTBOX_CONCURRENCY):
+        self.outbox = outbox or Outbox()
+        self.concurrency = max(1, concurrency)
+        self.rate_limiters = {
+            "resend": RateLimiter(RESEND_RATE_LIMIT),
+            "smtp": RateLimiter(SMTP_RATE_LIMIT),
+        }
+        self.local = threading.local()
+        self.senders = []
+
+    def _sender(self):
+        if not hasattr(self.local, "sender"):
+            sender = EmailSender()
+            sender.rate_limiters = self.rate_limiters
+            self.local.sender = sender
+            self.senders.append(sender)
+        return self.local.sender
+
+    def _deliver(self, message: Dict) -> bool:
+        try:
+            ok = self._sender().deliver_batch(message["recipients"], message["subject"], message["html"])
+            self.outbox.mark(message["id"], "sent" if ok else "failed", None if ok else "max retries reached")
+            return ok
+        except Exception as e:
+            self.outbox.mark(message["id"], "failed", str(e))
+            return False
+
+    def drain(self, report_id: Optional[str] = None) -> Dict[str, int]:
+        """Send everything currently pending (for `report_id` only, if given). Safe to re-run after a crash."""
+        expired = self.outbox.expire_old()
+        if expired:
+            print(f"⌛ Expired {expired} stale outbox message(s)")
+        # Batches that failed on an earlier run get another chance, up to MAX_SEND_ATTEMPTS
+        retried = self.outbox.retry_failed(MAX_SEND_ATTEMPTS)
+        if retried:
+            print(f"🔁 Retrying {retried} previously failed batch(es)")
+
+        sent = failed = 0
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            while True:
+                messages = self.outbox.claim(self.concurrency * 2, report_id)
+                if not messages:
+                    break
+                print(f"📤 Delivering {len(messages)} outbox batch(es)...")
+                for ok in executor.map(self._deliver, messages):
+                    if ok:
+                        sent += 1
+                    else:
+                        failed += 1
+
+        for sender in self.senders:
+            sender.close()
+
+        print(f"📬 Outbox drained: {sent} sent, {failed} failed")
+        return {"sent": sent, "failed": failed}
+
+def enqueue_report(html_content: str, title: str, outbox: Outbox = None,
+                   summary_data: Dict = None, report_id: str = None) -> int:
+    """
+    Queue today's report for every subscriber (idempotent per `report_id`).
+    Callers should pass a stable id such as the run date: the fallback, the
+    subject, is built from the title, which is not tied to the run date.
+    When `summary_data` is given, subscribers with an interest profile get
+    their own re-ranked digest; everyone else gets the shared report.
+    """
+    sender = EmailSender()
+    if not sender.recipients:
+        print("⚠️ No email recipients configured. Skipping email.")
+        return 0
+    if not sender.can_send():
+        print("⚠️ No email provider configured. Skipping email.")
+        return 0
+
+    outbox = outbox or Outbox()
+    subject = sender.build_subject(title)
+
+    digests = {}
+    if summary_data:
+        profiles = load_profiles()
+        profiled = {r: profiles[r.lower()] for r in sender.recipients if r.lower() in profiles}
+        digests = render_digests(summary_data, profiled)
+
+    added = 0
+    for recipient, digest_html in digests.items():
+        added += outbox.enqueue(subject, digest_html, [recipient], report_id=report_id)
+
+    shared = [r for r in sender.recipients if r not in digests]
+    if shared:
+        added += outbox.enqueue(subject, html_content, shared, sender.batch_size, report_id)
+
+    print(f"📥 Queued {added} email batch(es) for {len(sender.recipients)} recipients "
+          f"({len(digests)} personalized)")
+    return added
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Drain the outbound email queue")
+    parser.add_argument("--retry-failed", action="store_true",
+                        help=f"Re-queue all failed batches before draining (including those past {MAX_SEND_ATTEMPTS} attempts)")
+    parser.add_argument("--stats", action="store_true", help="Only print queue statistics")
+    parser.add_argument("--concurrency", type=int, default=OUTBOX_CONCURRENCY, help="Worker threads")
+    args = parser.parse_args()
+
+    box = Outbox()
+    if args.stats:
+        print(box.stats())
+        sys.exit(0)
+    if args.retry_failed:
+        print(f"🔁 Re-queued {box.retry_failed()} failed batch(es)")
+    OutboxWorker(box, concurrency=args.concurrency).drain()
@@ -0,0 +1,128 @@
+# src/personalization.py
+import os
+import re
+import json
+import concurrent.futures
+from datetime import datetime
+from typing import List, Dict, Tuple
+from jinja2 import Environment, FileSystemLoader
+from .config import BASE_DIR, TEMPLATE_DIR
+from .preferences import USER_INTERESTS, USER_DISLIKES
+
+# Lives next to subscribers.txt:
+# {"reader@example.com": {"interests": [...], "dislikes": [...], "top_n": 5}}
+PROFILES_FILE = os.path.join(BASE_DIR, "subscriber_profiles.json")
+
+INTEREST_WEIGHT = 2.0
+DISLIKE_PENALTY = 3.0
+TOP_STORIES = 5
+
+# Generic words that would make every interest match everything
+STOPWORDS = {"ai", "in", "the", "and", "of", "for", "hype", "systems"}
+
+def load_profiles(path: str = PROFILES_FILE) -> Dict[str, Dict]:
+    """Per-subscriber interest profiles, keyed by lower-cased email."""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            profiles = json.load(f)
+        return {email.strip().lower(): profile for email, profile in profiles.items()}
+    except Exception as e:
+        print(f"⚠️ Error loading subscriber profiles: {e}")
+        return {}
+
+def compile_terms(topics: List[str]) -> List[List[str]]:
+    """
+    Turn each topic ("Large Language Models (LLM)") into its lower-cased
+    keywords (["large language models (llm)", "large", "language", "models", "llm"]).
+    """
+    compiled = []
+    for topic in topics:
+        words = re.findall(r'[A-Za-z][A-Za-z0-9\-]+|[\u4e00-\u9fa5]{2,}', topic)
+        keywords = [topic.lower()] + [w.lower() for w in words if len(w) > 2 and w.lower() not in STOPWORDS]
+        compiled.append(keywords)
+    return compiled
+
+def _story_text(story: Dict) -> str:
+    parts = [story.get("title", ""), story.get("summary", ""), story.get("impact", "")]
+    parts += story.get("key_points", [])
+    return " ".join(parts).lower()
+
+def _hits(text: str, compiled: List[List[str]]) -> int:
+    """Number of topics with at least one keyword present in text."""
+    return sum(1 for keywords in compiled if any(k in text for k in keywords))
+
+def all_stories(summary_data: Dict) -> List[Dict]:
+    stories = list(summary_data.get("top_stories", []))
+    for items in summary_data.get("categories", {}).values():
+        stories.extend(items)
+    return stories
+
+def personalize(summary_data: Dict, profile: Dict, texts: List[str] = None) -> Dict:
+    """
+    Re-rank the already-analyzed stories for one subscriber using local
+    keyword scoring only. `texts` can carry precomputed story text.
+    """
+    stories = all_stories(summary_data)
+    texts = texts or [_story_text(s) for s in stories]
+    interests = compile_terms(profile.get("interests") or USER_INTERESTS)
+    dislikes = compile_terms(profile.get("dislikes") or USER_DISLIKES)
+    top_n = int(profile.get("top_n", TOP_STORIES))
+
+    scored = []
+    for story, text in zip(stories, texts):
+        score = (story.get("importance", 0)
+                 + INTEREST_WEIGHT * _hits(text, interests)
+                 - DISLIKE_PENALTY * _hits(text, dislikes))
+        scored.append((score, story))
+    # Stable sort keeps the original (LLM) order among equal scores
+    scored.sort(key=lambda pair: pair[0], reverse=True)
+
+    categories = {cat: [] for cat in summary_data.get("categories", {})}
+    for _, story in scored[top_n:]:
+        categories.setdefault(story.get("category", "其他"), []).append(story)
+
+    return {
+        **summary_data,
+        "top_stories": [story for _, story in scored[:top_n]],
+        "categories": categories,
+    }
+
+# --- Rendering (process pool, one compiled template per worker) ---
+
+# Per-worker state, set once by the pool initializer so each job only ships a profile
+_worker = {}
+
+def _init_renderer(summary_data: Dict, texts: List[str], generated_at: str):
+    env = Environment(loader=FileSystemLoader(TEMPLATE_DIR))
+    _worker["template"] = env.get_template("report_template.html")
+    _worker["summary_data"] = summary_data
+    _worker["texts"] = texts
+    _worker["generated_at"] = generated_at
+
+def _render_digest(job: Tuple[str, Dict]) -> Tuple[str, str]:
+    email, profile = job
+    data = personalize(_worker["summary_data"], profile, _worker["texts"])
+    return email, _worker["template"].render(data=data, generated_at=_worker["generated_at"])
+
+def render_digests(summary_data: Dict, profiles: Dict[str, Dict],
+                   max_workers: int = None) -> Dict[str, str]:
+    """
+    Render one HTML digest per profiled subscriber.
+    Cost is O(subscribers x stories) CPU and zero extra LLM calls.
+    """
+    if not profiles:
+        return {}
+
+    texts = [_story_text(s) for s in all_stories(summary_data)]
+    generated_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    jobs = list(profiles.items())
+
+    print(f"🎯 Rendering {len(jobs)} personalized digests...")
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=_init_renderer,
+        initargs=(summary_data, texts, generated_at)
+    ) as executor:
+        return dict(executor.map(_render_digest, jobs, chunksize=max(1, len(jobs) // 32)))
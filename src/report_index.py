@@ -0,0 +1,459 @@
+# src/report_index.py
+import os
+import re
+import argparse
+import json
+import hashlib
+import tempfile
+from html import escape
+from datetime import datetime, timedelta
+from typing import List, Dict, Optional, Tuple
+from jinja2 import Environment, FileSystemLoader
+from .config import REPORT_OUTPUT_DIR, TEMPLATE_DIR, REPORT_RETENTION_DAYS
+from .report_store import ReportStore, STORE_DIRNAME
+
+INDEX_FILENAME = "index.json"
+ARCHIVE_DIRNAME = "archive"
+ARCHIVE_PAGE_SIZE = 30
+# Viewer pages for stored reports, under the archive dir
+VIEWER_DIRNAME = "reports"
+
+# Loads a store object in the browser: fetch, gunzip, re-inline the shared <style> assets
+VIEWER_TEMPLATE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{title}</title></head>
+<body><p id="status">Loading report…</p>
+<script>
+(async () => {{
+  try {{
+    const response = await fetch({object});
+    if (!response.ok) throw new Error("HTTP " + response.status);
+    const body = {gzip} ? response.body.pipeThrough(new DecompressionStream("gzip")) : response.body;
+    let html = await new Response(body).text();
+    for (const placeholder of new Set(html.match(/<!--asset:[0-9a-f]{{64}}-->/g) || [])) {{
+      const css = await (await fetch({assets} + placeholder.slice(10, 74) + ".css")).text();
+      html = html.split(placeholder).join("<style>" + css + "</style>");
+    }}
+    document.open();
+    document.write(html);
+    document.close();
+  }} catch (e) {{
+    document.getElementById("status").textContent =
+      "Could not load this report (" + e + "). Serve output/ over HTTP, or open it from the dashboard.";
+  }}
+}})();
+</script></body></html>
+"""
+
+# Filename prefix -> report kind
+REPORT_KINDS = {
+    "ai_news_report_": "report",
+    "wechat_post_": "wechat",
+}
+
+class ReportIndex:
+    """
+    Manifest of everything written to the output directory.
+
+    Keeps `latest` and `by_date` lookup tables so callers never have to
+    list and sort the whole directory to find a report.
+    """
+    def __init__(self, output_dir: str = REPORT_OUTPUT_DIR):
+        self.output_dir = output_dir
+        self.index_path = os.path.join(output_dir, INDEX_FILENAME)
+        self.archive_dir = os.path.join(output_dir, ARCHIVE_DIRNAME)
+        self.store = ReportStore(os.path.join(output_dir, STORE_DIRNAME))
+        self._sorted_cache = {}
+        self.data = self._load()
+
+    def _empty(self) -> Dict:
+        return {"version": 1, "reports": {}, "latest": {}, "by_date": {}, "pages": {}}
+
+    def _load(self) -> Dict:
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self._backfill_refs(data)
+                return data
+            except Exception as e:
+                print(f"⚠️ Report index unreadable, rebuilding: {e}")
+
+        self.data = self._empty()
+        if os.path.exists(self.output_dir):
+            self.rebuild()
+        return self.data
+
+    def _backfill_refs(self, data: Dict):
+        """Write store refs for stored entries indexed before refs existed."""
+        for entry in data.get("reports", {}).values():
+            if entry.get("object") and not self.store.has_ref(entry["file"]):
+                self.store.write_ref(entry)
+
+    def _save(self):
+        """Write the manifest atomically (temp file + rename)."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.output_dir, prefix=".index-", suffix=".json")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self.data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.index_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @staticmethod
+    def parse_filename(filename: str) -> Optional[Dict]:
+        """Extract kind and timestamp from a generated report filename."""
+        for prefix, kind in REPORT_KINDS.items():
+            if filename.startswith(prefix):
+                stem = os.path.splitext(filename[len(prefix):])[0]
+                try:
+                    ts = datetime.strptime(stem, "%Y%m%d_%H%M%S")
+                except ValueError:
+                    return None
+                return {"kind": kind, "timestamp": ts}
+        return None
+
+    def _scan_file(self, filepath: str) -> Dict:
+        """Recover title/top stories from an existing HTML file (used on rebuild only)."""
+        with open(filepath, 'r', encoding='utf-8') as f:
+            html = f.read()
+
+        title_match = re.search(r'<title>(.*?)</title>', html, re.S)
+        intro_match = re.search(r'<div class="intro">\s*(?:<strong>.*?</strong>)?(.*?)</div>', html, re.S)
+        # Top stories are the cards before the first category heading
+        top_section = html.split('📂', 1)[0]
+        top_titles = re.findall(r'<h3[^>]*>(?:<a[^>]*>)?(.*?)(?:</a>)?</h3>', top_section, re.S)
+        summaries = re.findall(r'<div class="summary">(.*?)</div>', top_section, re.S)
+        return {
+            "title": title_match.group(1).strip() if title_match else "",
+            "intro": intro_match.group(1).strip() if intro_match else "",
+            "top_stories": [t.strip() for t in top_titles][:5],
+            "summaries": [t.strip() for t in summaries][:5],
+        }
+
+    def _make_entry(self, filepath: str, data: Dict = None, stored: Dict = None) -> Optional[Dict]:
+        filename = os.path.basename(filepath)
+        parsed = self.parse_filename(filename)
+        if not parsed:
+            return None
+
+        if data:
+            meta = {
+                "title": data.get("title", ""),
+                "intro": data.get("intro", ""),
+                "top_stories": [s.get("title", "") for s in data.get("top_stories", [])],
+                "summaries": [s.get("summary", "") for s in data.get("top_stories", [])],
+            }
+        else:
+            meta = self._scan_file(filepath)
+
+        ts = parsed["timestamp"]
+        entry = {
+            "file": filename,
+            "kind": parsed["kind"],
+            "date": ts.strftime("%Y-%m-%d"),
+            "generated_at": ts.strftime("%Y-%m-%d %H:%M:%S"),
+            "format": os.path.splitext(filename)[1].lstrip("."),
+            "size": stored["size"] if stored else os.path.getsize(filepath),
+            **meta,
+        }
+        if stored:
+            entry.update(stored)
+            if stored["compression"] != "none":
+                entry["format"] += f"+{stored['compression']}"
+        return entry
+
+    def _insert(self, entry: Dict):
+        filename = entry["file"]
+        self.data["reports"][filename] = entry
+        self._sorted_cache = {}
+
+        # Timestamped filenames sort chronologically, so string comparison is enough
+        kind = entry["kind"]
+        latest = self.data["latest"].get(kind)
+        if not latest or filename >= latest:
+            self.data["latest"][kind] = filename
+
+        if kind == "report":
+            current = self.data["by_date"].get(entry["date"])
+            if not current or filename >= current:
+                self.data["by_date"][entry["date"]] = filename
+
+    def add(self, filepath: str, data: Dict = None, stored: Dict = None) -> Optional[Dict]:
+        """
+        Register a newly written report and persist the manifest.
+        `stored` is the metadata returned by ReportStore.put() when the
+        report lives in the content-addressed store instead of `filepath`.
+        """
+        entry = self._make_entry(filepath, data, stored)
+        if not entry:
+            return None
+        if stored:
+            # The index is rebuildable only if every stored report has a ref
+            self.store.write_ref(entry)
+        self._insert(entry)
+        self._save()
+        return entry
+
+    def remove(self, filename: str):
+        """Drop an entry (caller is responsible for saving)."""
+        self.data["reports"].pop(filename, None)
+        self._sorted_cache = {}
+        self.data["latest"] = {}
+        self.data["by_date"] = {}
+        for entry in self.data["reports"].values():
+            self._insert(entry)
+
+    def rebuild(self):
+        """
+        Re-scan the output directory (one-off migration for pre-index archives)
+        and re-register stored reports from their store refs. Store objects
+        that no ref maps are recorded in `unmapped_objects`, which blocks
+        garbage collection until they are accounted for.
+        """
+        print(f"🗂️ Building report index for {self.output_dir}...")
+        self.data = self._empty()
+        for ref in self.store.read_refs():
+            if ref.get("object") and os.path.exists(self.path_for(ref)):
+                self._insert(ref)
+            else:
+                print(f"⚠️ Store ref {ref.get('file')} points to a missing object")
+
+        for filename in sorted(os.listdir(self.output_dir)):
+            filepath = os.path.join(self.output_dir, filename)
+            if not os.path.isfile(filepath):
+                continue
+            try:
+                entry = self._make_entry(filepath)
+            except Exception as e:
+                print(f"⚠️ Skipping {filename}: {e}")
+                continue
+            if entry:
+                self._insert(entry)
+
+        mapped = {e["object"] for e in self.data["reports"].values() if e.get("object")}
+        unmapped = sorted(self.store.object_keys() - mapped)
+        if unmapped:
+            self.data["unmapped_objects"] = unmapped
+            print(f"⚠️ {len(unmapped)} store object(s) are not referenced by any report; "
+                  f"garbage collection is disabled until they are restored to {self.store.refs_dir} "
+                  f"and the index is rebuilt")
+        self._save()
+
+    # --- Lookups ---
+
+    def get(self, filename: str) -> Optional[Dict]:
+        return self.data["reports"].get(filename)
+
+    def latest(self, kind: str = "report") -> Optional[Dict]:
+        filename = self.data["latest"].get(kind)
+        return self.get(filename) if filename else None
+
+    def for_date(self, date: str) -> Optional[Dict]:
+        """Latest daily report for a YYYY-MM-DD date."""
+        filename = self.data["by_date"].get(date)
+        return self.get(filename) if filename else None
+
+    def path_for(self, entry: Dict) -> str:
+        return os.path.join(self.output_dir, entry.get("object") or entry["file"])
+
+    def read(self, entry: Dict) -> str:
+        """Full HTML of a report, transparently decompressed and rehydrated."""
+        return self.store.read(self.path_for(entry))
+
+    def entries(self, kind: str = "report") -> List[Dict]:
+        """All entries of a kind, newest first (sorted once per manifest change)."""
+        if kind not in self._sorted_cache:
+            items = [e for e in self.data["reports"].values() if e["kind"] == kind]
+            items.sort(key=lambda e: e["file"], reverse=True)
+            self._sorted_cache[kind] = items
+        return self._sorted_cache[kind]
+
+    @staticmethod
+    def _search_text(entry: Dict) -> str:
+        parts = [entry.get("title", ""), entry.get("intro", ""), entry["date"]]
+        parts += entry.get("top_stories", []) + entry.get("summaries", [])
+        return " ".join(parts).lower()
+
+    def search(self, query: str = "", kind: str = "report",
+               offset: int = 0, limit: int = 20) -> Tuple[List[Dict], int]:
+        """
+        Page through entries (newest first), optionally filtered so that every
+        whitespace-separated term appears in the title, intro, date or stories.
+        Returns (page_entries, total_matches).
+        """
+        items = self.entries(kind)
+        terms = query.lower().split()
+        if terms:
+            items = [e for e in items if all(t in self._search_text(e) for t in terms)]
+        return items[offset:offset + limit], len(items)
+
+    # --- Static archive site ---
+
+    def _viewer_href(self, entry: Dict) -> str:
+        """
+        Link target for an archive entry, relative to the output dir. Stored
+        reports get a viewer page that loads the object in the browser (zstd
+        cannot be decoded there, so those get a rehydrated copy instead).
+        """
+        if not entry.get("object"):
+            return entry["file"]
+
+        viewer_dir = os.path.join(self.archive_dir, VIEWER_DIRNAME)
+        viewer_path = os.path.join(viewer_dir, entry["file"])
+        if entry.get("compression") == "zstd":
+            html = None if os.path.exists(viewer_path) else self.read(entry)
+        else:
+            def url(path, suffix=""):
+                return json.dumps(os.path.relpath(path, viewer_dir).replace(os.sep, "/") + suffix)
+            html = VIEWER_TEMPLATE.format(
+                title=escape(entry.get("title") or entry["file"]),
+                object=url(self.path_for(entry)),
+                assets=url(self.store.assets_dir, "/"),
+                gzip="true" if entry.get("compression") == "gzip" else "false",
+            )
+            if os.path.exists(viewer_path):
+                with open(viewer_path, 'r', encoding='utf-8') as f:
+                    if f.read() == html:
+                        html = None
+        if html is not None:
+            os.makedirs(viewer_dir, exist_ok=True)
+            with open(viewer_path, "w", encoding="utf-8") as f:
+                f.write(html)
+        return f"{ARCHIVE_DIRNAME}/{VIEWER_DIRNAME}/{entry['file']}"
+
+    def _prune_viewers(self):
+        """Remove viewer pages whose report is gone (retention) or no longer stored."""
+        viewer_dir = os.path.join(self.archive_dir, VIEWER_DIRNAME)
+        if not os.path.isdir(viewer_dir):
+            return
+        for filename in os.listdir(viewer_dir):
+            entry = self.get(filename)
+            if not entry or not entry.get("object"):
+                os.remove(os.path.join(viewer_dir, filename))
+
+    def build_archive(self, page_size: int = ARCHIVE_PAGE_SIZE) -> int:
+        """
+        Render the paginated archive under output/archive/.
+
+        Pages are numbered oldest-first so existing pages keep their content
+        as new reports arrive; only pages whose signature changed are re-rendered.
+        """
+        os.makedirs(self.archive_dir, exist_ok=True)
+        env = Environment(loader=FileSystemLoader(TEMPLATE_DIR))
+        template = env.get_template("archive_template.html")
+
+        entries = self.entries("report")
+        hrefs = {e["file"]: self._viewer_href(e) for e in entries}
+        self._prune_viewers()
+
+        chronological = list(reversed(entries))
+        pages = [chronological[i:i + page_size] for i in range(0, len(chronological), page_size)]
+        total_pages = len(pages)
+        rendered = 0
+
+        for page_num, page_entries in enumerate(pages, 1):
+            has_next = page_num < total_pages
+            signature = hashlib.sha1(json.dumps(
+                [[e["file"], e["title"], e["size"], e["top_stories"], e.get("object")] for e in page_entries] + [has_next],
+                ensure_ascii=False
+            ).encode("utf-8")).hexdigest()
+
+            page_path = os.path.join(self.archive_dir, f"page_{page_num}.html")
+            if self.data["pages"].get(str(page_num)) == signature and os.path.exists(page_path):
+                continue
+
+            html = template.render(
+                entries=[dict(e, href=hrefs[e["file"]]) for e in reversed(page_entries)],
+                page=page_num,
+                has_next=has_next
+            )
+            with open(page_path, "w", encoding="utf-8") as f:
+                f.write(html)
+            self.data["pages"][str(page_num)] = signature
+            rendered += 1
+
+        # Drop pages left over from a larger archive (after compaction)
+        for key in [k for k in self.data["pages"] if int(k) > total_pages]:
+            stale_path = os.path.join(self.archive_dir, f"page_{key}.html")
+            if os.path.exists(stale_path):
+                os.remove(stale_path)
+            del self.data["pages"][key]
+            rendered += 1
+
+        # Entry point always redirects to the newest page
+        if total_pages:
+            with open(os.path.join(self.archive_dir, "index.html"), "w", encoding="utf-8") as f:
+                f.write(f'<!DOCTYPE html><meta http-equiv="refresh" content="0; url=page_{total_pages}.html">')
+
+        if rendered:
+            self._save()
+            print(f"🗄️ Archive updated: {rendered} page(s) changed, {total_pages} total")
+        return rendered
+
+    # --- Retention / compaction ---
+
+    def compact(self, keep_days: int = REPORT_RETENTION_DAYS, migrate: bool = False):
+        """
+        Apply retention, optionally move plain HTML files into the store,
+        and garbage-collect store objects no longer referenced.
+        """
+        removed = 0
+        if keep_days > 0:
+            cutoff = (datetime.now() - timedelta(days=keep_days)).strftime("%Y-%m-%d")
+            for entry in list(self.data["reports"].values()):
+                if entry["date"] < cutoff:
+                    if not entry.get("object") and os.path.exists(self.path_for(entry)):
+                        os.remove(self.path_for(entry))
+                    self.store.remove_ref(entry["file"])
+                    self.remove(entry["file"])
+                    removed += 1
+
+        migrated = 0
+        if migrate:
+            for entry in self.data["reports"].values():
+                if entry.get("object"):
+                    continue
+                plain_path = self.path_for(entry)
+                with open(plain_path, 'r', encoding='utf-8') as f:
+                    stored = self.store.put(f.read())
+                entry.update(stored)
+                if stored["compression"] != "none":
+                    entry["format"] = f"html+{stored['compression']}"
+                self.store.write_ref(entry)
+                os.remove(plain_path)
+                migrated += 1
+
+        collected = 0
+        if self.data.get("unmapped_objects"):
+            # Those objects may be the only copy of reports the index lost track of
+            print(f"⚠️ Skipping garbage collection: the last rebuild found "
+                  f"{len(self.data['unmapped_objects'])} unmapped store object(s)")
+        else:
+            live_objects = {e["object"] for e in self.data["reports"].values() if e.get("object")}
+            live_assets = {a for e in self.data["reports"].values() for a in e.get("assets", [])}
+            collected = self.store.garbage_collect(live_objects, live_assets)
+
+        self._save()
+        self.build_archive()
+        print(f"🧹 Compaction done: {removed} expired, {migrated} migrated, {collected} store files collected")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report index maintenance")
+    parser.add_argument("--rebuild", action="store_true", help="Re-scan output/ and rebuild the manifest")
+    parser.add_argument("--compact", action="store_true", help="Apply retention and garbage-collect the store")
+    parser.add_argument("--keep-days", type=int, default=REPORT_RETENTION_DAYS, help="Retention window in days (0 = keep all)")
+    parser.add_argument("--migrate", action="store_true", help="With --compact: move plain HTML reports into the store")
+    args = parser.parse_args()
+
+    index = ReportIndex()
+    if args.rebuild:
+        index.rebuild()
+    if args.compact:
+        index.compact(keep_days=args.keep_days, migrate=args.migrate)
+    else:
+        index.build_archive()
+    latest = index.latest()
+    print(f"Latest report: {latest['file'] if latest else 'N/A'}")
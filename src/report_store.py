@@ -0,0 +1,189 @@
+# src/report_store.py
+import os
+import re
+import gzip
+import json
+import hashlib
+import tempfile
+from typing import Dict, List, Set
+from .config import REPORT_OUTPUT_DIR, REPORT_COMPRESSION
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+STORE_DIRNAME = "store"
+
+# Only bare <style> blocks are split out so rehydration is byte-exact
+STYLE_PATTERN = re.compile(r'<style>(.*?)</style>', re.S)
+ASSET_PLACEHOLDER = re.compile(r'<!--asset:([0-9a-f]{64})-->')
+
+COMPRESSION_SUFFIXES = {
+    "none": "",
+    "gzip": ".gz",
+    "zstd": ".zst",
+}
+
+class ReportStore:
+    """
+    Content-addressed storage for generated reports.
+
+    Inline <style> blocks are split into shared assets (stored once),
+    the remaining body is keyed by its SHA-256 and optionally compressed.
+    `read()` reverses both steps so callers always get the original HTML.
+
+    refs/<report file>.json records which object belongs to which report, so
+    the index can be rebuilt without losing stored reports.
+    """
+    def __init__(self, root: str = None, compression: str = REPORT_COMPRESSION):
+        self.root = root or os.path.join(REPORT_OUTPUT_DIR, STORE_DIRNAME)
+        self.objects_dir = os.path.join(self.root, "objects")
+        self.assets_dir = os.path.join(self.root, "assets")
+        self.refs_dir = os.path.join(self.root, "refs")
+
+        if compression not in COMPRESSION_SUFFIXES:
+            print(f"⚠️ Unknown compression '{compression}', using gzip.")
+            compression = "gzip"
+        if compression == "zstd" and zstandard is None:
+            print("⚠️ zstandard not installed, falling back to gzip.")
+            compression = "gzip"
+        self.compression = compression
+
+    @staticmethod
+    def _hash(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    @staticmethod
+    def _write_atomic(path: str, data: bytes):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.compression == "gzip":
+            # mtime=0 keeps output deterministic, so unchanged objects don't churn in git
+            return gzip.compress(data, mtime=0)
+        if self.compression == "zstd":
+            return zstandard.ZstdCompressor(level=19).compress(data)
+        return data
+
+    @staticmethod
+    def _decompress(path: str, data: bytes) -> bytes:
+        if path.endswith(".gz"):
+            return gzip.decompress(data)
+        if path.endswith(".zst"):
+            if zstandard is None:
+                raise RuntimeError(f"zstandard is required to read {path}")
+            return zstandard.ZstdDecompressor().decompress(data)
+        return data
+
+    def _asset_path(self, digest: str) -> str:
+        return os.path.join(self.assets_dir, f"{digest}.css")
+
+    def put(self, html: str) -> Dict:
+        """
+        Store a rendered report. Returns storage metadata for the report index.
+        """
+        assets = []
+
+        def extract(match):
+            css = match.group(1).encode("utf-8")
+            digest = self._hash(css)
+            asset_path = self._asset_path(digest)
+            if not os.path.exists(asset_path):
+                self._write_atomic(asset_path, css)
+            assets.append(digest)
+            return f"<!--asset:{digest}-->"
+
+        body = STYLE_PATTERN.sub(extract, html).encode("utf-8")
+        digest = self._hash(body)
+        suffix = COMPRESSION_SUFFIXES[self.compression]
+        rel_path = os.path.join("objects", digest[:2], f"{digest}.html{suffix}")
+        object_path = os.path.join(self.root, rel_path)
+
+        # Identical reports collapse onto the same object
+        if not os.path.exists(object_path):
+            self._write_atomic(object_path, self._compress(body))
+
+        return {
+            "object": os.path.join(STORE_DIRNAME, rel_path),
+            "assets": assets,
+            "size": len(html.encode("utf-8")),
+            "stored_size": os.path.getsize(object_path),
+            "compression": self.compression,
+        }
+
+    def read(self, path: str) -> str:
+        """
+        Read any report file: plain HTML, compressed, or a store object.
+        """
+        with open(path, 'rb') as f:
+            data = self._decompress(path, f.read())
+        html = data.decode("utf-8")
+
+        def inline(match):
+            with open(self._asset_path(match.group(1)), 'rb') as f:
+                return f"<style>{f.read().decode('utf-8')}</style>"
+
+        return ASSET_PLACEHOLDER.sub(inline, html)
+
+    def _ref_path(self, filename: str) -> str:
+        return os.path.join(self.refs_dir, f"{filename}.json")
+
+    def write_ref(self, entry: Dict):
+        """Persist a stored report's index entry next to the objects."""
+        data = json.dumps(entry, ensure_ascii=False, indent=2, sort_keys=True).encode("utf-8")
+        self._write_atomic(self._ref_path(entry["file"]), data)
+
+    def has_ref(self, filename: str) -> bool:
+        return os.path.exists(self._ref_path(filename))
+
+    def remove_ref(self, filename: str):
+        if self.has_ref(filename):
+            os.remove(self._ref_path(filename))
+
+    def read_refs(self) -> List[Dict]:
+        refs = []
+        if not os.path.exists(self.refs_dir):
+            return refs
+        for filename in sorted(os.listdir(self.refs_dir)):
+            if not filename.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.refs_dir, filename), 'r', encoding='utf-8') as f:
+                    refs.append(json.load(f))
+            except Exception as e:
+                print(f"⚠️ Unreadable store ref {filename}: {e}")
+        return refs
+
+    def object_keys(self) -> Set[str]:
+        """Every object on disk, as the `object` path used by index entries."""
+        keys = set()
+        for dirpath, _, filenames in os.walk(self.objects_dir):
+            for filename in filenames:
+                if not filename.startswith(".tmp-"):
+                    keys.add(os.path.relpath(os.path.join(dirpath, filename), os.path.dirname(self.root)))
+        return keys
+
+    def garbage_collect(self, live_objects: Set[str], live_assets: Set[str]) -> int:
+        """Delete objects/assets not referenced by any index entry."""
+        removed = 0
+        for directory, live in ((self.objects_dir, live_objects), (self.assets_dir, live_assets)):
+            if not os.path.exists(directory):
+                continue
+            for dirpath, _, filenames in os.walk(directory):
+                for filename in filenames:
+                    path = os.path.join(dirpath, filename)
+                    key = filename.split(".", 1)[0] if directory == self.assets_dir else os.path.relpath(path, os.path.dirname(self.root))
+                    if key not in live:
+                        os.remove(path)
+                        removed += 1
+        return removed
@@ -2,7 +2,8 @@
 import os
 from jinja2 import Environment, FileSystemLoader
 from datetime import datetime
-from .config import REPORT_OUTPUT_DIR, TEMPLATE_DIR
+from .config import REPORT_OUTPUT_DIR, TEMPLATE_DIR, REPORT_STORAGE
+from .report_index import ReportIndex
 
 class Reporter:
     def __init__(self):
@@ -22,6 +23,8 @@ class Reporter:
         if not os.path.exists(REPORT_OUTPUT_DIR):
             os.makedirs(REPORT_OUTPUT_DIR)
 
+        self.index = ReportIndex(REPORT_OUTPUT_DIR)
+
     def generate_report(self, data: dict):
         """
         Generate HTML report from data
@@ -41,12 +44,32 @@ class Reporter:
         filename = f"ai_news_report_{current_time.strftime('%Y%m%d_%H%M%S')}.html"
         filepath = os.path.join(REPORT_OUTPUT_DIR, filename)
         
-        with open(filepath, "w", encoding="utf-8") as f:
-            f.write(html_content)
-            
-        print(f"Report generated successfully: {filepath}")
+        stored = None
+        if REPORT_STORAGE == "store":
+            stored = self.index.store.put(html_content)
+            print(f"Report stored: {stored['object']} ({stored['stored_size']} / {stored['size']} bytes)")
+        else:
+            with open(filepath, "w", encoding="utf-8") as f:
+                f.write(html_content)
+            print(f"Report generated successfully: {filepath}")
+
+        # Keep manifest + static archive in sync (never fail the report for it)
+        try:
+            self.index.add(filepath, data, stored=stored)
+            self.index.build_archive()
+        except Exception as e:
+            print(f"⚠️ Failed to update report index: {e}")
+
+        if stored:
+            return os.path.join(REPORT_OUTPUT_DIR, stored["object"])
         return filepath
 
+    def read_report(self, path: str) -> str:
+        """
+        Read a report returned by generate_report(), whatever the storage mode.
+        """
+        return self.index.store.read(path)
+
     def generate_wechat_html(self, data: dict):
         """
         Generate WeChat-optimized HTML report
@@ -70,7 +93,8 @@ class Reporter:
                 context["hot_news"].append({
                     "title": item.get("title"),
                     "source": item.get("source"),
-                    "image": item.get("image_url") or "", # Fallback logic in template?
+                    # Remote URL of the probed best image: the WeChat editor re-hosts remote images but cannot read local files
+                    "image": item.get("image") or "",
                     "one_sentence_summary": item.get("summary"),
                     "key_points": item.get("key_points", []),
                     "insight": item.get("impact", "")
@@ -94,6 +118,7 @@ class Reporter:
             with open(filepath, "w", encoding="utf-8") as f:
                 f.write(html_content)
                 
+            self.index.add(filepath, data)
             print(f"✅ WeChat HTML ready: {filepath}")
             return filepath
             
@@ -0,0 +1,133 @@
+# src/search_backends.py
+import hashlib
+import threading
+from typing import List, Dict
+from .config import SEARCH_BACKEND, SEARCH_CACHE_ENABLED, SEARCH_RATE_LIMIT, SEARCH_CONCURRENCY
+from .search_cache import SearchCache
+from .rate_limiter import RateLimiter
+
+class SearchBackend:
+    """
+    Web search provider. `text` returns a list of
+    {"title", "href", "body"} dicts (the DDGS result shape).
+    """
+    name = "base"
+    rate_limited = False  # Remote service: calls go through the shared per-backend limits
+
+    def text(self, query: str, max_results: int = 5) -> List[Dict]:
+        raise NotImplementedError
+
+class DDGSBackend(SearchBackend):
+    name = "ddgs"
+    rate_limited = True
+
+    def __init__(self):
+        from duckduckgo_search import DDGS
+        self.ddgs = DDGS()
+
+    def text(self, query: str, max_results: int = 5) -> List[Dict]:
+        return list(self.ddgs.text(query, max_results=max_results) or [])
+
+class StubBackend(SearchBackend):
+    """
+    Deterministic offline backend for tests and demos: the same query always
+    yields the same results, and related queries share some URLs so merging
+    and de-duplication can be exercised without network access.
+    """
+    name = "stub"
+
+    def text(self, query: str, max_results: int = 5) -> List[Dict]:
+        topic = query.split()[0] if query.split() else query
+        results = []
+        for i in range(max_results):
+            # Even slots are shared by every query about the same topic
+            seed = topic if i % 2 == 0 else query
+            slug = hashlib.md5(f"{seed}:{i}".encode("utf-8")).hexdigest()[:10]
+            results.append({
+                "title": f"{query} #{i + 1}",
+                "href": f"https://example.com/{slug}?utm_source=stub",
+                "body": f"Offline stub result {i + 1} for '{query}'."
+            })
+        return results
+
+def is_transient_error(error: Exception) -> bool:
+    """Rate limits, timeouts and connection errors: worth retrying soon, not caching."""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    name = type(error).__name__.lower()
+    return "ratelimit" in name or "timeout" in name or "connection" in name
+
+_limits = {}
+_limits_lock = threading.Lock()
+
+def backend_limits(name: str):
+    """(RateLimiter, Semaphore) shared by every instance of the named backend in the process."""
+    with _limits_lock:
+        if name not in _limits:
+            _limits[name] = (RateLimiter(SEARCH_RATE_LIMIT, burst=max(1, SEARCH_CONCURRENCY)),
+                             threading.BoundedSemaphore(max(1, SEARCH_CONCURRENCY)))
+        return _limits[name]
+
+class ThrottledBackend(SearchBackend):
+    """
+    Caps a remote backend process-wide: at most SEARCH_CONCURRENCY requests in
+    flight and SEARCH_RATE_LIMIT requests per second, however many research
+    pools or topics are searching at once.
+    """
+    def __init__(self, backend: SearchBackend):
+        self.backend = backend
+        self.name = backend.name
+        self.rate_limiter, self.semaphore = backend_limits(backend.name)
+
+    def text(self, query: str, max_results: int = 5) -> List[Dict]:
+        with self.semaphore:
+            self.rate_limiter.acquire()
+            return self.backend.text(query, max_results=max_results)
+
+class CachedBackend(SearchBackend):
+    """
+    Serves repeated queries from the persistent SearchCache. Empty results and
+    permanent failures are cached for a short time (negative caching) and
+    reported as [] while that entry lives; rate limits and other transient
+    errors are not cached, so the next search retries the backend.
+    """
+    def __init__(self, backend: SearchBackend, cache: SearchCache = None, ttl: int = None):
+        self.backend = backend
+        self.name = backend.name
+        self.cache = cache or SearchCache()
+        self.ttl = ttl  # Overrides the per-backend TTL when set
+
+    def text(self, query: str, max_results: int = 5) -> List[Dict]:
+        cached = self.cache.get(self.name, query, max_results)
+        if cached is not None:
+            print(f"⚡ Search cache hit{'' if cached['ok'] else ' (recent failure)'}: {query}")
+            return cached["results"]
+
+        try:
+            results = self.backend.text(query, max_results=max_results)
+        except Exception as e:
+            if not is_transient_error(e):
+                self.cache.put(self.name, query, max_results, [], ok=False)
+            raise
+
+        self.cache.put(self.name, query, max_results, results, ttl=self.ttl if results else None)
+        return results
+
+BACKENDS = {
+    "ddgs": DDGSBackend,
+    "stub": StubBackend,
+}
+
+def get_search_backend(name: str = None, cached: bool = SEARCH_CACHE_ENABLED,
+                       ttl: int = None) -> SearchBackend:
+    """
+    Backend by name: remote backends are throttled (cache hits are not), and
+    the result is wrapped in the persistent search cache unless disabled.
+    """
+    name = (name or SEARCH_BACKEND).lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown search backend '{name}'. Available: {', '.join(BACKENDS)}")
+    backend = BACKENDS[name]()
+    if backend.rate_limited:
+        backend = ThrottledBackend(backend)
+    return CachedBackend(backend, ttl=ttl) if cached else backend
@@ -0,0 +1,86 @@
+# src/search_cache.py
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+from contextlib import contextmanager
+from typing import List, Dict, Optional
+from .config import BASE_DIR, SEARCH_CACHE_TTLS, SEARCH_CACHE_NEGATIVE_TTL
+
+SEARCH_CACHE_DB = os.path.join(BASE_DIR, "data", "search_cache.db")
+DEFAULT_TTL = 6 * 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS searches (
+    key TEXT PRIMARY KEY,
+    backend TEXT NOT NULL,
+    query TEXT NOT NULL,
+    results TEXT NOT NULL,
+    ok INTEGER NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_searches_expires ON searches(expires_at);
+"""
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive form of a query."""
+    return re.sub(r'\s+', ' ', query).strip().lower()
+
+class SearchCache:
+    """
+    Persistent (SQLite) TTL cache of normalized query -> search results.
+
+    Empty searches and permanent failures are cached too, for a shorter
+    time, so the same dead query is not retried on every run.
+    """
+    def __init__(self, db_path: str = SEARCH_CACHE_DB):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with self._db() as conn:
+            conn.executescript(SCHEMA)
+            conn.execute("DELETE FROM searches WHERE expires_at < ?", (time.time(),))
+
+    @contextmanager
+    def _db(self):
+        """Autocommit connection that is always closed."""
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def make_key(backend: str, query: str, max_results: int) -> str:
+        raw = f"{backend}\0{normalize_query(query)}\0{max_results}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, backend: str, query: str, max_results: int) -> Optional[Dict]:
+        """{"ok": bool, "results": [...]} if a live entry exists, else None."""
+        with self._db() as conn:
+            row = conn.execute(
+                "SELECT results, ok FROM searches WHERE key = ? AND expires_at >= ?",
+                (self.make_key(backend, query, max_results), time.time())
+            ).fetchone()
+        if row is None:
+            return None
+        return {"ok": bool(row[1]), "results": json.loads(row[0])}
+
+    def put(self, backend: str, query: str, max_results: int, results: List[Dict],
+            ok: bool = True, ttl: int = None):
+        if ttl is None:
+            ttl = SEARCH_CACHE_TTLS.get(backend, DEFAULT_TTL) if ok and results else SEARCH_CACHE_NEGATIVE_TTL
+        with self._db() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO searches (key, backend, query, results, ok, expires_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (self.make_key(backend, query, max_results), backend, normalize_query(query),
+                 json.dumps(results, ensure_ascii=False), int(ok), time.time() + ttl)
+            )
+
+    def clear(self, backend: str = None) -> int:
+        with self._db() as conn:
+            if backend:
+                return conn.execute("DELETE FROM searches WHERE backend = ?", (backend,)).rowcount
+            return conn.execute("DELETE FROM searches").rowcount
@@ -0,0 +1,249 @@
+# src/subscriber_store.py
+import os
+import re
+import sys
+import sqlite3
+import argparse
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator, Dict, Optional, Tuple
+
+# Allow running as `python src/subscriber_store.py`
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.config import BASE_DIR
+
+SUBSCRIBERS_DB = os.path.join(BASE_DIR, "data", "subscribers.db")
+SUBSCRIBERS_FILE = os.path.join(BASE_DIR, "subscribers.txt")
+
+# Hard bounces before an address stops receiving mail
+MAX_BOUNCES = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS subscribers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    email TEXT NOT NULL UNIQUE,
+    address TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'active',
+    subscribed_at TEXT NOT NULL,
+    bounce_count INTEGER NOT NULL DEFAULT 0,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_subscribers_status ON subscribers(status, id);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# subscribers.txt lines: "addr", "addr  # bounces=2", "# unsubscribed: addr", "# bounced: addr"
+LINE_PATTERN = re.compile(r'^(?:#\s*(unsubscribed|bounced):\s*)?([^\s#]+@[^\s#]+)(?:\s+#\s*bounces=(\d+))?$')
+
+# Serializes rewrites of subscribers.txt within the process
+_file_lock = threading.Lock()
+
+def _now() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+def parse_line(line: str) -> Optional[Tuple[str, str, int]]:
+    """(address, status, bounce_count) for a subscribers.txt line, None for blanks and comments."""
+    match = LINE_PATTERN.match(line.strip())
+    if not match:
+        return None
+    return match.group(2), match.group(1) or "active", int(match.group(3) or 0)
+
+def format_line(address: str, status: str, bounce_count: int = 0) -> str:
+    if status != "active":
+        return f"# {status}: {address}"
+    return f"{address}  # bounces={bounce_count}" if bounce_count else address
+
+class SubscriberStore:
+    """
+    SQLite-backed subscriber list.
+
+    `email` holds the normalized address under a UNIQUE index, so lookups and
+    inserts are index seeks and concurrent signups of the same address
+    collapse into one row. `address` keeps the address as it was entered.
+
+    subscribers.txt stays the durable record (the DB is gitignored and CI
+    starts from a fresh checkout): signups, unsubscribes and bounces are
+    written back to it, and the DB re-syncs from it whenever it changes.
+    """
+    def __init__(self, db_path: str = SUBSCRIBERS_DB, subscribers_file: str = SUBSCRIBERS_FILE):
+        self.db_path = db_path
+        self.subscribers_file = subscribers_file
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with self._db() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    @contextmanager
+    def _db(self):
+        """Autocommit connection that is always closed."""
+        conn = self._connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def normalize(email: str) -> str:
+        return email.strip().lower()
+
+    @staticmethod
+    def is_valid(email: str) -> bool:
+        email = email.strip()
+        return "@" in email and not email.startswith("#") and " " not in email
+
+    def _write_entry(self, address: str, status: str, bounce_count: int = 0):
+        """Replace (or append) the address's line in subscribers.txt, atomically."""
+        if not self.subscribers_file:
+            return
+        key = self.normalize(address)
+        new_line = format_line(address, status, bounce_count)
+        with _file_lock:
+            lines = []
+            if os.path.exists(self.subscribers_file):
+                with open(self.subscribers_file, "r", encoding="utf-8") as f:
+                    lines = f.read().splitlines()
+            for i, line in enumerate(lines):
+                entry = parse_line(line)
+                if entry and self.normalize(entry[0]) == key:
+                    lines[i] = new_line
+                    break
+            else:
+                lines.append(new_line)
+
+            tmp_path = f"{self.subscribers_file}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+            os.replace(tmp_path, self.subscribers_file)
+
+    def _write_row(self, email: str):
+        row = self.get(email)
+        if row:
+            self._write_entry(row["address"], row["status"], row["bounce_count"])
+
+    def add(self, email: str) -> bool:
+        """Subscribe `email` (recorded in subscribers.txt too). Returns False if it was already present."""
+        with self._db() as conn:
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO subscribers (email, address, subscribed_at, updated_at) VALUES (?, ?, ?, ?)",
+                (self.normalize(email), email.strip(), _now(), _now())
+            )
+            added = cur.rowcount == 1
+        if added:
+            self._write_entry(email.strip(), "active")
+        return added
+
+    def get(self, email: str) -> Dict:
+        with self._db() as conn:
+            row = conn.execute("SELECT * FROM subscribers WHERE email = ?", (self.normalize(email),)).fetchone()
+        return dict(row) if row else None
+
+    def exists(self, email: str) -> bool:
+        return self.get(email) is not None
+
+    def set_status(self, email: str, status: str) -> bool:
+        with self._db() as conn:
+            cur = conn.execute(
+                "UPDATE subscribers SET status = ?, updated_at = ? WHERE email = ?",
+                (status, _now(), self.normalize(email))
+            )
+            updated = cur.rowcount == 1
+        if updated:
+            self._write_row(email)
+        return updated
+
+    def record_bounce(self, email: str, max_bounces: int = MAX_BOUNCES):
+        """Count a hard bounce; the address is disabled once it reaches `max_bounces`."""
+        with self._db() as conn:
+            conn.execute(
+                "UPDATE subscribers SET bounce_count = bounce_count + 1, "
+                "status = CASE WHEN bounce_count + 1 >= ? THEN 'bounced' ELSE status END, "
+                "updated_at = ? WHERE email = ?",
+                (max_bounces, _now(), self.normalize(email))
+            )
+        self._write_row(email)
+
+    def import_file(self, path: str = None) -> int:
+        """
+        Bulk-import a subscribers.txt-style file in a single transaction. The
+        file wins: status and bounce count of existing rows follow it.
+        Returns rows added or changed.
+        """
+        path = path or self.subscribers_file
+        if not path or not os.path.exists(path):
+            return 0
+        with open(path, "r", encoding="utf-8") as f:
+            entries = [entry for entry in map(parse_line, f) if entry]
+
+        now = _now()
+        with self._db() as conn:
+            before = conn.total_changes
+            conn.execute("BEGIN")
+            conn.executemany(
+                "INSERT INTO subscribers (email, address, status, bounce_count, subscribed_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(email) DO UPDATE SET status = excluded.status, bounce_count = excluded.bounce_count, "
+                "updated_at = excluded.updated_at "
+                "WHERE status != excluded.status OR bounce_count != excluded.bounce_count",
+                ((self.normalize(a), a, status, bounces, now, now) for a, status, bounces in entries)
+            )
+            conn.execute("COMMIT")
+            return conn.total_changes - before
+
+    def sync_file(self) -> int:
+        """Re-import subscribers.txt only if it changed since the last sync (by mtime)."""
+        if not self.subscribers_file or not os.path.exists(self.subscribers_file):
+            return 0
+        mtime = str(os.stat(self.subscribers_file).st_mtime_ns)
+        with self._db() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'file_mtime'").fetchone()
+        if row and row["value"] == mtime:
+            return 0
+
+        changed = self.import_file()
+        with self._db() as conn:
+            conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('file_mtime', ?)", (mtime,))
+        return changed
+
+    def iter_active(self, chunk_size: int = 500) -> Iterator[str]:
+        """Stream active addresses in subscription order without loading the table."""
+        with self._db() as conn:
+            cur = conn.execute("SELECT address FROM subscribers WHERE status = 'active' ORDER BY id")
+            while True:
+                rows = cur.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row["address"]
+
+    def stats(self) -> Dict[str, int]:
+        with self._db() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM subscribers GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the subscriber database")
+    parser.add_argument("--import-file", nargs="?", const=SUBSCRIBERS_FILE, help="Import addresses from a text file")
+    parser.add_argument("--add", help="Subscribe an address")
+    parser.add_argument("--unsubscribe", help="Unsubscribe an address")
+    parser.add_argument("--stats", action="store_true", help="Print subscriber counts by status")
+    args = parser.parse_args()
+
+    store = SubscriberStore()
+    if args.import_file:
+        print(f"📥 Imported {store.import_file(args.import_file)} new or changed subscriber(s)")
+    if args.add:
+        print("✅ Added" if store.add(args.add) else "ℹ️ Already subscribed")
+    if args.unsubscribe:
+        print("✅ Unsubscribed" if store.set_status(args.unsubscribe, "unsubscribed") else "ℹ️ Not found")
+    if args.stats or not (args.import_file or args.add or args.unsubscribe):
+        print(store.stats())
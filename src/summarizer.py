@@ -1,15 +1,45 @@
 # src/summarizer.py
+import os
+import re
 import json
+import hashlib
 import concurrent.futures
-from typing import List, Dict
+from typing import List, Dict, Callable
 from openai import OpenAI
-from .config import OPENAI_API_KEY, OPENAI_BASE_URL, LLM_MODEL, TOKEN_SAVING_MODE
+from .config import (
+    OPENAI_API_KEY, OPENAI_BASE_URL, LLM_MODEL, TOKEN_SAVING_MODE, BASE_DIR,
+    DEEP_REPORT_CONTEXT_TOKENS, DEEP_REPORT_MAP_WORKERS
+)
+from .rate_limiter import RateLimiter
 
 from .preferences import USER_INTERESTS, USER_DISLIKES
 from .memory_manager import MemoryManager
 
+NOTE_CACHE_DIR = os.path.join(BASE_DIR, "data", "note_cache")
+SOURCE_CHARS = 6000  # Per-source text fed to the map step
+MAX_REDUCE_LEVELS = 3
+
+def estimate_tokens(text: str) -> int:
+    """Rough count: ~1 token per CJK character, ~4 characters per token otherwise."""
+    cjk = len(re.findall(r'[\u4e00-\u9fff]', text))
+    return cjk + (len(text) - cjk) // 4
+
+def pack_by_tokens(texts: List[str], budget: int) -> List[List[str]]:
+    """Greedily group consecutive texts so each group stays within `budget` tokens."""
+    groups, current, used = [], [], 0
+    for text in texts:
+        cost = estimate_tokens(text)
+        if current and used + cost > budget:
+            groups.append(current)
+            current, used = [], 0
+        current.append(text)
+        used += cost
+    if current:
+        groups.append(current)
+    return groups
+
 class NewsSummarizer:
-    def __init__(self):
+    def __init__(self, rate_limiter: RateLimiter = None):
         if not OPENAI_API_KEY:
             raise ValueError("OPENAI_API_KEY not found in environment variables.")
         
@@ -19,6 +49,31 @@ class NewsSummarizer:
         )
         self.model = LLM_MODEL
         self.memory = MemoryManager()
+        self.rate_limiter = rate_limiter  # Optional, shared by every thread using this summarizer
+
+    def _chat(self, **kwargs):
+        """chat.completions.create, throttled by the shared rate limiter if one is set."""
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+        return self.client.chat.completions.create(**kwargs)
+
+    def _complete(self, on_token: Callable[[str], None] = None, **kwargs) -> str:
+        """
+        Completion text. With `on_token`, the response is streamed and every
+        text delta is passed to the callback as it arrives.
+        """
+        if on_token is None:
+            return self._chat(**kwargs).choices[0].message.content
+
+        parts = []
+        for chunk in self._chat(stream=True, **kwargs):
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                on_token(delta)
+        return "".join(parts)
 
     def batch_filter_articles(self, news_items: List[Dict]) -> List[Dict]:
         """
@@ -54,7 +109,7 @@ class NewsSummarizer:
 }}
 """
         try:
-            response = self.client.chat.completions.create(
+            response = self._chat(
                 model=self.model, # Can use a cheaper model here if available
                 messages=[
                     {"role": "system", "content": "You are a strict news editor. Output JSON only."},
@@ -104,7 +159,7 @@ class NewsSummarizer:
 }}
 """
         try:
-            response = self.client.chat.completions.create(
+            response = self._chat(
                 model=self.model,
                 messages=[
                     {"role": "system", "content": "You are an AI analyst. Output raw JSON only."},
@@ -168,21 +223,25 @@ class NewsSummarizer:
                 "source": item['source'],
                 "link": item['link'],
                 "image": item.get('image'),
+                "image_candidates": item.get('image_candidates', []),
                 "impact": item.get('impact_analysis', ''),
-                "key_points": item.get('key_points', [])
+                "key_points": item.get('key_points', []),
+                "importance": item.get('importance_score', 0)
             }
 
+            cat = item.get('category', '其他')
+            # Map LLM category to our fixed keys
+            target_cat = "其他"
+            if "模型" in cat or "技术" in cat: target_cat = "模型与技术"
+            elif "行业" in cat or "商业" in cat: target_cat = "行业与商业"
+            elif "学术" in cat or "研究" in cat: target_cat = "学术与研究"
+            elif "应用" in cat or "工具" in cat: target_cat = "工具与应用"
+            # Kept so per-subscriber digests can re-bucket stories without another LLM call
+            story_data["category"] = target_cat
+
             if i < 5:
                 top_stories.append(story_data)
             else:
-                cat = item.get('category', '其他')
-                # Map LLM category to our fixed keys
-                target_cat = "其他"
-                if "模型" in cat or "技术" in cat: target_cat = "模型与技术"
-                elif "行业" in cat or "商业" in cat: target_cat = "行业与商业"
-                elif "学术" in cat or "研究" in cat: target_cat = "学术与研究"
-                elif "应用" in cat or "工具" in cat: target_cat = "工具与应用"
-                
                 categories[target_cat].append(story_data)
 
         # Generate Intro using Top Stories + Memory Context
@@ -200,7 +259,7 @@ class NewsSummarizer:
 要求：简练、专业，突出连续性（如果有）。
 """
         try:
-            intro_resp = self.client.chat.completions.create(
+            intro_resp = self._chat(
                 model=self.model,
                 messages=[{"role": "user", "content": intro_prompt}]
             )
@@ -220,15 +279,107 @@ class NewsSummarizer:
         
         return final_summary
 
-    def generate_deep_report(self, topic: str, research_data: list) -> str:
+    def generate_deep_report(self, topic: str, research_data: list,
+                             context_tokens: int = DEEP_REPORT_CONTEXT_TOKENS,
+                             on_token: Callable[[str], None] = None) -> str:
         """
         Generate a long-form deep dive report based on research data.
+
+        Small corpora go straight into one prompt. Larger ones are map-reduced:
+        each source is condensed into notes in parallel (cached on disk), and
+        notes are merged level by level until they fit `context_tokens`.
+        `on_token` streams the final report as it is written.
+        """
+        sources = [
+            f"--- Source {i+1}: {item['title']} ---\n{item['full_content'][:2000]}\n\n"
+            for i, item in enumerate(research_data)
+        ]
+        if estimate_tokens("".join(sources)) <= context_tokens:
+            return self._write_deep_report(topic, "".join(sources), on_token)
+
+        # Map: per-source notes
+        print(f"🗂️ Condensing {len(research_data)} sources into notes...")
+        with concurrent.futures.ThreadPoolExecutor(max_workers=DEEP_REPORT_MAP_WORKERS) as executor:
+            notes = list(executor.map(lambda item: self.condense_source(topic, item), research_data))
+        notes = [
+            f"--- Source {i+1}: {item['title']} ---\n{note}\n\n"
+            for i, (item, note) in enumerate(zip(research_data, notes)) if note
+        ]
+
+        # Reduce: merge groups of notes until everything fits one prompt
+        for level in range(MAX_REDUCE_LEVELS):
+            if estimate_tokens("".join(notes)) <= context_tokens:
+                break
+            groups = pack_by_tokens(notes, context_tokens)
+            print(f"🧩 Reduce level {level + 1}: merging {len(notes)} notes into {len(groups)} digests...")
+            with concurrent.futures.ThreadPoolExecutor(max_workers=DEEP_REPORT_MAP_WORKERS) as executor:
+                merged = list(executor.map(lambda group: self.merge_notes(topic, "".join(group)), groups))
+            notes = [f"--- Digest {i+1} ---\n{m}\n\n" for i, m in enumerate(merged) if m]
+
+        return self._write_deep_report(topic, "".join(notes), on_token)
+
+    def condense_source(self, topic: str, item: Dict) -> str:
+        """
+        [Map Step] Condense one source into topic-focused notes.
+        Cached by (model, topic, source text), so re-runs skip the call.
         """
-        context = ""
-        for i, item in enumerate(research_data):
-            context += f"--- Source {i+1}: {item['title']} ---\n"
-            context += f"{item['full_content'][:2000]}\n\n"
+        text = (item.get('full_content') or item.get('summary') or "")[:SOURCE_CHARS]
+        key = hashlib.sha256(f"{self.model}\0{topic}\0{item.get('title', '')}\0{text}".encode("utf-8")).hexdigest()
+        cache_path = os.path.join(NOTE_CACHE_DIR, f"{key}.json")
+        if os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)["note"]
+            except Exception:
+                pass
+
+        prompt = f"""
+请针对主题 "{topic}"，把以下资料压缩成要点笔记（不超过 300 字）。
+只保留与主题相关的事实、关键数据、观点及其出处，不要评论。
+
+标题：{item.get('title', '')}
+正文：
+{text}
+"""
+        try:
+            response = self._chat(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.2
+            )
+            note = response.choices[0].message.content.strip()
+        except Exception as e:
+            print(f"⚠️ Note failed for '{item.get('title', '')[:30]}': {e}")
+            # Fall back to the raw (truncated) text instead of losing the source
+            return text[:1000]
+
+        os.makedirs(NOTE_CACHE_DIR, exist_ok=True)
+        tmp_path = cache_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"topic": topic, "title": item.get('title', ''), "note": note}, f, ensure_ascii=False)
+        os.replace(tmp_path, cache_path)
+        return note
+
+    def merge_notes(self, topic: str, notes: str) -> str:
+        """[Reduce Step] Merge a group of notes into one de-duplicated digest."""
+        prompt = f"""
+请把以下关于 "{topic}" 的多份资料笔记合并为一份综合笔记（不超过 800 字）。
+合并重复信息，保留关键数据和不同观点，并注明来源编号。
+
+{notes}
+"""
+        try:
+            response = self._chat(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.2
+            )
+            return response.choices[0].message.content.strip()
+        except Exception as e:
+            print(f"⚠️ Merge failed: {e}")
+            return notes[:4000]
 
+    def _write_deep_report(self, topic: str, context: str, on_token: Callable[[str], None] = None) -> str:
         prompt = f"""
 请根据以下收集到的资料，撰写一份关于 "{topic}" 的深度行业研报。
 
@@ -244,7 +395,8 @@ class NewsSummarizer:
 """
         try:
             print(f"🧠 Generating deep dive report for '{topic}'...")
-            response = self.client.chat.completions.create(
+            return self._complete(
+                on_token=on_token,
                 model=self.model,
                 messages=[
                     {"role": "system", "content": "You are a senior AI industry analyst."},
@@ -252,11 +404,11 @@ class NewsSummarizer:
                 ],
                 temperature=0.4
             )
-            return response.choices[0].message.content
         except Exception as e:
             return f"Error generating report: {e}"
 
-    def generate_marp_slides(self, topic: str, report_content: str, style: str = "academic") -> str:
+    def generate_marp_slides(self, topic: str, report_content: str, style: str = "academic",
+                             on_token: Callable[[str], None] = None) -> str:
         """
         Convert a deep dive report into a Marp-formatted slide deck.
         Style options: 'academic' (default, strict), 'viral' (for social media/business).
@@ -318,7 +470,8 @@ paginate: true
 """
         try:
             print(f"🎨 Generating Marp slides for '{topic}' (Style: {style})...")
-            response = self.client.chat.completions.create(
+            return self._complete(
+                on_token=on_token,
                 model=self.model,
                 messages=[
                     {"role": "system", "content": "You are a presentation expert skilled in Marp markdown."},
@@ -326,11 +479,11 @@ paginate: true
                 ],
                 temperature=0.5 if style == "viral" else 0.3
             )
-            return response.choices[0].message.content
         except Exception as e:
             return f"Error generating slides: {e}"
 
-    def generate_video_script(self, topic: str, report_content: str, platform: str = "tiktok") -> str:
+    def generate_video_script(self, topic: str, report_content: str, platform: str = "tiktok",
+                              on_token: Callable[[str], None] = None) -> str:
         """
         Generate a short video script based on the report.
         """
@@ -357,7 +510,8 @@ paginate: true
 """
         try:
             print(f"🎬 Generating video script for '{topic}'...")
-            response = self.client.chat.completions.create(
+            return self._complete(
+                on_token=on_token,
                 model=self.model,
                 messages=[
                     {"role": "system", "content": "You are a viral content creator."},
@@ -365,6 +519,5 @@ paginate: true
                 ],
                 temperature=0.7 
             )
-            return response.choices[0].message.content
         except Exception as e:
             return f"Error generating script: {e}"
@@ -1,13 +1,14 @@
 
 import json
 from datetime import datetime
-from duckduckgo_search import DDGS
 from openai import OpenAI
-from .config import OPENAI_API_KEY, OPENAI_BASE_URL, LLM_MODEL
+from .config import OPENAI_API_KEY, OPENAI_BASE_URL, LLM_MODEL, TRENDING_CACHE_TTL
+from .search_backends import get_search_backend
 
 class TopicManager:
     def __init__(self):
-        self.ddgs = DDGS()
+        # Trends go stale faster than research results
+        self.search = get_search_backend(ttl=TRENDING_CACHE_TTL)
         self.client = OpenAI(
             api_key=OPENAI_API_KEY,
             base_url=OPENAI_BASE_URL
@@ -23,7 +24,7 @@ class TopicManager:
         # 1. Search for trends
         try:
             query = f"today's top news and trending topics in China {datetime.now().strftime('%Y-%m-%d')}"
-            results = self.ddgs.text(query, max_results=10)
+            results = self.search.text(query, max_results=10)
             
             if not results:
                 print("⚠️ Search returned empty, using fallback trends.")
@@ -0,0 +1,70 @@
+import os
+import time
+from collections import OrderedDict
+
+from jinja2 import Environment, FileSystemLoader
+
+from src import email_optimizer
+from src.config import TEMPLATE_DIR
+
+
+def render_report(story_count: int) -> str:
+    stories = [
+        {
+            "title": f"Story {i}: a model release with a reasonably long headline",
+            "link": f"https://example.com/news/{i}",
+            "source": "Example News",
+            "summary": "A few sentences summarising the story. " * 3,
+            "key_points": ["First point", "Second point", "Third point"],
+            "impact": "Why it matters for the industry.",
+        }
+        for i in range(story_count)
+    ]
+    data = {
+        "title": "AI Daily",
+        "intro": "Today's overview.",
+        "top_stories": stories[:5],
+        "categories": {"Models": stories[5:15], "Products": stories[15:]},
+    }
+    template = Environment(loader=FileSystemLoader(TEMPLATE_DIR)).get_template("report_template.html")
+    return template.render(data=data, generated_at="2026-01-01 08:00:00")
+
+
+def test_optimized_email_is_not_larger_than_report(tmp_path, monkeypatch):
+    monkeypatch.setattr(email_optimizer, "EMAIL_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(email_optimizer, "_memory_cache", OrderedDict())
+
+    html = render_report(25)
+    payload = email_optimizer.optimize_email(html, inline_images=False)
+
+    assert payload["original_size"] == len(html.encode("utf-8"))
+    assert payload["size"] <= payload["original_size"]
+    assert payload["size"] == len(payload["html"].encode("utf-8"))
+
+
+def test_strip_markup_keeps_inline_spacing_and_pre():
+    html = "<div>\n  <p>a <b>bold</b> <i>word</i></p>\n  <pre>  keep\n    this</pre>\n</div>"
+    stripped = email_optimizer.strip_markup(html)
+
+    assert "<p>a <b>bold</b> <i>word</i></p>" in stripped
+    assert "<pre>  keep\n    this</pre>" in stripped
+    assert "<div><p>" in stripped
+
+
+def test_caches_are_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(email_optimizer, "EMAIL_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(email_optimizer, "_memory_cache", OrderedDict())
+    monkeypatch.setattr(email_optimizer, "MEMORY_CACHE_ENTRIES", 2)
+    monkeypatch.setattr(email_optimizer, "DISK_CACHE_MAX_FILES", 3)
+
+    stale = tmp_path / "stale.json"
+    stale.write_text("{}")
+    old = time.time() - (email_optimizer.DISK_CACHE_MAX_AGE_DAYS + 1) * 86400
+    os.utime(stale, (old, old))
+
+    for i in range(5):
+        email_optimizer.optimize_email(f"<p>digest {i}</p>", inline_images=False)
+
+    assert len(email_optimizer._memory_cache) == 2
+    assert not stale.exists()
+    assert len(list(tmp_path.glob("*.json"))) == 3